@@ -1,12 +1,26 @@
+import os
+import sys
+
 from mesa import Agent
 import numpy as np
-import random
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
 import model
+from space import ObjectView
+from common.streams import spawn_stream
 
-class ObjectAgent(Agent):
-    def __init__(self, model, object_type):
-        super().__init__(model)
-        self.object_type = object_type
+class ObjectAgent(ObjectView):
+    """An object: a view of one id of the grid's object store (objects are no Mesa agents)."""
+    __slots__ = ()
+
+    @property
+    def object_type(self):
+        return int(self.model.grid.objects.fields["object_type"][self.unique_id])
+
+    @property
+    def row(self):
+        """Row of model.dataset this object stands for, if any."""
+        row = int(self.model.grid.objects.fields["row"][self.unique_id])
+        return None if row < 0 else row
 
 
 class AntAgent(Agent):
@@ -14,62 +28,109 @@ class AntAgent(Agent):
         super().__init__(model)
         self.carrying = None
         self.step_size = step_size
+        self.stream = spawn_stream(model.rng)
 
     def neighborhood_function(self):
         """Modified neighborhood function f* as per the requirements in the image."""
-        alpha = self.model.ALPHA
         sigma_squared = self.model.SIGMA_SQUARED
         radius1 = int((np.sqrt(sigma_squared) - 1) / 2)
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=radius1)
+        grid = self.model.grid
+        store = grid.objects
+        # Either every cell within radius1, or neighborhood_samples random ones, each
+        # standing for weight cells, so the sum below estimates the full one
+        if self.model.neighborhood_samples:
+            cells, weight = grid.sample_neighborhood(self.pos, radius1, self.model.neighborhood_samples,
+                                                     self.stream.generator)
+        else:
+            cells, weight = grid.neighborhood(self.pos, radius=radius1), 1
+        objects = store.gather(cells)
+
+        if self.carrying:
+            reference = self.carrying
+        else:
+            # Check the type of ObjectAgent at the ant's position
+            object_at_pos = store.at(self.pos)
+            reference = store.view(object_at_pos[0]) if object_at_pos else None
 
         # Calculate the modified similarity measure for each neighbor
-        similarities = []
-        for n in neighbors:
-            if isinstance(n, ObjectAgent):
-                if self.carrying:
-                    obj_type = self.carrying.object_type
-                    similarity = 1 - (self.distance(obj_type, n.object_type) / alpha)
-                else:
-                    # Check the type of ObjectAgent at the ant's position
-                    cell_contents = self.model.grid.get_cell_list_contents([self.pos])
-                    object_at_pos = [obj for obj in cell_contents if isinstance(obj, ObjectAgent)]
-
-                    if object_at_pos:  # Ensure there is an object at the position
-                        obj_type = object_at_pos[0].object_type
-                        similarity = 1 - (self.distance(obj_type, n.object_type) / alpha)
-                    else:
-                        similarity = 1  # Default similarity if no object is under the ant
-                similarities.append(similarity)
-
-        # Return the modified similarity function value
-        if all(similarity > 0 for similarity in similarities):
-            return (1 / sigma_squared) * sum(similarities)
+        if reference is None:
+            similarities = np.ones(len(objects))  # Default similarity if no object is under the ant
+        else:
+            similarities = 1 - self.scaled_distances(reference, objects)
+
+        # Return the modified similarity function value. With sampled cells, whether every
+        # similarity in the window is positive is decided from all of it, not the samples
+        if weight == 1:
+            positive = np.all(similarities > 0)
+        else:
+            positive = reference is None or self.all_similar(reference)
+        if positive:
+            return (weight / sigma_squared) * np.sum(similarities)
         else:
             return 0.0
 
+    def all_similar(self, reference):
+        """Whether every object in the similarity window has a positive similarity to the
+        typed object reference, from the grid's per-type window counts (an O(1) lookup)."""
+        if 1 - self.distance(0, 1) / self.model.ALPHA > 0:
+            return True
+        counts = self.model.grid.windows.at(self.pos)
+        return counts.sum() == counts[reference.object_type]
+
+    def scaled_distances(self, obj, ids):
+        """Dissimilarities d(obj, o) / alpha to the objects ids, served by the model's dataset
+        if it has one."""
+        fields = self.model.grid.objects.fields
+        dataset = self.model.dataset
+        if dataset is not None:
+            return dataset.scaled_dissimilarities(obj.row, fields["row"][ids])
+        object_types = fields["object_type"][ids].tolist()
+        return np.array([self.distance(obj.object_type, t) for t in object_types]) / self.model.ALPHA
+
     def distance(self, obj1, obj2):
         """Distance (dissimilarity) function between objects"""
         return 0 if obj1 == obj2 else 1
 
-    def pick_up(self):
-        """A function for picking up an object by an agent."""
+    def pick_probability(self):
+        """f* and the pick-up probability p_pick at the ant's cell."""
         neighborhood_similarity = self.neighborhood_function()
         k_plus = self.model.PICKUP_THRESHOLD  # соответствует k^+ из формулы
-        p_pick = (k_plus / (k_plus + neighborhood_similarity)) ** 2
-        return np.random.rand() < p_pick
+        return neighborhood_similarity, (k_plus / (k_plus + neighborhood_similarity)) ** 2
+
+    def drop_probability(self):
+        """f* and the drop probability p_drop of the carried object at the ant's cell."""
+        neighborhood_similarity = self.neighborhood_function()
+        k_minus = self.model.DROP_THRESHOLD  # соответствует k^- из формулы
+        return neighborhood_similarity, (neighborhood_similarity / (k_minus + neighborhood_similarity)) ** 2
 
+    def cached(self, compute):
+        """compute() as (f*, probability), served by the model's cache if it has one."""
+        cache = self.model.cache
+        if not self.carrying:
+            key = -1
+        elif self.model.dataset is None:
+            key = self.carrying.object_type
+        else:
+            # A carried dataset row would rarely meet the same cell twice
+            return compute()
+        if cache is None:
+            return compute()
+        return cache.get(self.pos, key, compute)
+
+    def pick_up(self):
+        """A function for picking up an object by an agent."""
+        _, p_pick = self.cached(self.pick_probability)
+        return self.stream.random() < p_pick
 
     def drop(self):
         """Function for dropping an object by an agent."""
-        neighborhood_similarity = self.neighborhood_function()
-        k_minus = self.model.DROP_THRESHOLD  # соответствует k^- из формулы
-        p_drop = (neighborhood_similarity / (k_minus + neighborhood_similarity)) ** 2
-        return np.random.rand()  < p_drop
+        _, p_drop = self.cached(self.drop_probability)
+        return self.stream.random() < p_drop
 
     def move(self, add=0):
         """Move the agent by step_size in a random direction."""
-        new_position = (self.pos[0] + random.randint(-self.step_size - add, self.step_size + add),
-                        self.pos[1] + random.randint(-self.step_size - add, self.step_size + add))
+        new_position = (self.pos[0] + self.stream.randint(-self.step_size - add, self.step_size + add),
+                        self.pos[1] + self.stream.randint(-self.step_size - add, self.step_size + add))
         self.model.grid.move_agent(self, new_position)
 
     def step(self):
@@ -78,11 +139,13 @@ class AntAgent(Agent):
             if self.drop():
                 self.model.grid.place_agent(self.carrying, self.pos)
                 self.carrying = None
+                self.model.drops += 1
             self.move()
         else:
-            neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=1)
-            objects = [obj for obj in neighbors if isinstance(obj, ObjectAgent)]
-            if objects and self.pick_up():
-                self.carrying = random.choice(objects)
+            store = self.model.grid.objects
+            objects = store.gather(self.model.grid.neighborhood(self.pos))
+            if len(objects) and self.pick_up():
+                self.carrying = store.view(int(self.stream.choice(objects)))
                 self.model.grid.remove_agent(self.carrying)
+                self.model.pickups += 1
             self.move(add=0)
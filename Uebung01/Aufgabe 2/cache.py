@@ -0,0 +1,55 @@
+"""Lazily re-evaluated pick-up and drop probabilities of the Lumer-Faieta ants.
+
+f* of an ant depends only on its cell, on the object it carries (or, if it carries
+nothing, on the object under it) and on the objects within the similarity radius.
+Late in a run most of the grid no longer changes, so f* and the probability derived
+from it are cached per (cell, carried key) and only recomputed once an object was
+placed or removed within the radius of the cell.
+"""
+
+
+class ProbabilityCache:
+    """f* and p_pick / p_drop per cell and carried key, evicted around grid changes.
+
+    The carried key is the carried object's type, or -1 for ants that carry nothing
+    (their entries hold p_pick, the others p_drop). Every placement or removal drops the
+    entries of the cells within radius of it, so only entries that are still valid are
+    kept: at most one per object type and one for empty-handed ants per cell. Dataset
+    rows are too many to be worth a key; ants carrying one are not cached (see
+    AntAgent.cached). The entries assume fixed model parameters; clear() them after
+    changing the thresholds, alpha or sigma.
+    """
+
+    def __init__(self, grid, radius):
+        self.grid = grid
+        self.radius = radius
+        self.entries = {}  # cell -> {carried key: (f*, probability)}
+        self.hits = 0
+        self.misses = 0
+        grid.observers.append(self.invalidate)
+
+    def invalidate(self, obj, pos, delta):
+        """Drop the entries of the cells within radius of pos (an object was placed or removed there)."""
+        for cell in self.grid.neighborhood(pos, self.radius, include_center=True).tolist():
+            self.entries.pop(cell, None)
+
+    def get(self, pos, key, compute):
+        """(f*, probability) at pos for carried key, from compute() if there is no entry."""
+        cell_entries = self.entries.setdefault(pos[0] * self.grid.height + pos[1], {})
+        entry = cell_entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = cell_entries[key] = compute()
+        return entry
+
+    def __len__(self):
+        return sum(len(cell_entries) for cell_entries in self.entries.values())
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.entries.clear()
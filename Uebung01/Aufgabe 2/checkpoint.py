@@ -0,0 +1,101 @@
+"""Checkpoint/restore for ClusteringModel.
+
+The model state is written as compact arrays (positions, object types and dataset
+rows, carrying links, ant ids, per-ant random streams, the model's RNG states, the
+convergence monitor, step counters) into one compressed .npz file, and restored into
+an identical model without pickling Mesa agents. A memory-mapped
+dataset is referenced by its file name, an in-memory one is stored in the checkpoint.
+The compiled backends are rebuilt from the restored grid and reseeded with the seed
+they were started with; numba's RNG state cannot be read back, so its draws start over
+from that seed and only the Mesa backend continues bit for bit.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from agents import AntAgent
+from dataset import Dataset
+from model import ClusteringModel
+from common.checkpoint import (bucket_slots, cell_slots, pack_convergence, pack_random_states,
+                               place_in_bucket_order, place_in_cell_order, restore_ids, unpack_convergence,
+                               unpack_random_states)
+from common.streams import pack_streams, unpack_streams
+
+
+def save(model, path):
+    """Write the state of model to a compressed .npz file at path."""
+    model.refresh_grid()
+    ants = list(model.schedule.agents)
+    objects = model.grid.objects
+
+    arrays = {
+        "width": model.grid.width,
+        "height": model.grid.height,
+        "backend": model.backend,
+        "neighborhood_samples": model.neighborhood_samples or 0,
+        "radius": model.radius,
+        "obj_pos": np.column_stack((objects.x, objects.y)).astype(np.int32),
+        "obj_type": objects.fields["object_type"].astype(np.int32),
+        "obj_row": objects.fields["row"],
+        "obj_slot": bucket_slots(objects),
+        "ant_id": np.array([a.unique_id for a in ants], dtype=np.int64),
+        "ant_pos": np.array([a.pos for a in ants], dtype=np.int32).reshape(-1, 2),
+        "ant_slot": cell_slots(model.grid, ants),
+        "ant_carry": np.array([a.carrying.unique_id if a.carrying else -1 for a in ants], dtype=np.int32),
+        "ant_step_size": np.array([a.step_size for a in ants], dtype=np.int32),
+        "steps": model.steps,
+        "schedule_steps": model.schedule.steps,
+        "schedule_time": model.schedule.time,
+    }
+    if model.kernel is not None:
+        # The kernel arrays are the object state; the grid is only their mirror
+        arrays["obj_pos"] = np.column_stack((model.kernel.obj_x, model.kernel.obj_y)).astype(np.int32)
+        arrays["obj_slot"] = model.kernel.object_slots()
+        arrays["kernel_seed"] = model.kernel.seed
+    if model.dataset is not None:
+        filename = getattr(model.dataset.data, "filename", None)
+        if filename is not None:
+            arrays["dataset_path"] = np.array(str(filename))
+        else:
+            arrays["dataset"] = model.dataset.data
+    arrays.update(pack_streams([a.stream for a in ants]))
+    arrays.update(pack_random_states(model))
+    arrays.update(pack_convergence(model.convergence))
+    np.savez_compressed(path, **arrays)
+
+
+def load(path, n_workers=None):
+    """Rebuild the model saved at path."""
+    with np.load(path, allow_pickle=False) as f:
+        data = dict(f)
+
+    model = ClusteringModel(int(data["width"]), int(data["height"]), num_agents=0, num_objects=0,
+                            neighborhood_samples=int(data.get("neighborhood_samples", 0)) or None,
+                            radius=int(data.get("radius", 2)))
+    if "dataset_path" in data:
+        model.dataset = Dataset(data["dataset_path"].item(), model.ALPHA)
+    elif "dataset" in data:
+        model.dataset = Dataset(data["dataset"], model.ALPHA)
+
+    objects = model.grid.objects.add(len(data["obj_type"]), object_type=data["obj_type"], row=data["obj_row"])
+    place_in_bucket_order(model.grid, objects, data["obj_pos"], data["obj_slot"])
+    ants = [AntAgent(model, step_size=s) for s in data["ant_step_size"].tolist()]
+    if "ant_id" in data:
+        restore_ids(model, ants, data["ant_id"].tolist())
+    place_in_cell_order(model.grid, ants, data["ant_pos"], data["ant_slot"])
+    for ant, carried in zip(ants, data["ant_carry"].tolist()):
+        ant.carrying = model.grid.objects.view(carried) if carried >= 0 else None
+        model.schedule.add(ant)
+
+    model.steps = int(data["steps"])
+    model.schedule.steps = int(data["schedule_steps"])
+    model.schedule.time = data["schedule_time"].item()
+
+    unpack_random_states(model, data)
+    unpack_convergence(model, data)
+    unpack_streams([a.stream for a in ants], data)
+    kernel_seed = int(data["kernel_seed"]) if "kernel_seed" in data else None
+    model._start_backend(data["backend"].item(), n_workers, kernel_seed)
+    return model
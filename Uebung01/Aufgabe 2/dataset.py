@@ -0,0 +1,84 @@
+"""Feature-vector data for ClusteringModel objects.
+
+Each ObjectAgent can reference a row of an N-dimensional dataset instead of only an
+integer type. Rows are read from a memory-mapped .npy file, and the ALPHA-scaled
+dissimilarities d(i, j) / alpha are served from a precomputed condensed matrix when
+the dataset is small enough, otherwise from a bounded LRU cache of row pairs.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+
+class Dataset:
+    """Rows of a dataset with cached, ALPHA-scaled Euclidean dissimilarities."""
+
+    def __init__(self, data, alpha, cache_size=1_000_000, precompute_limit=4096):
+        if isinstance(data, (str, bytes)) or hasattr(data, "__fspath__"):
+            data = np.load(data, mmap_mode="r")
+        self.data = data if isinstance(data, np.ndarray) else np.asarray(data)
+        if self.data.ndim == 1:
+            self.data = self.data.reshape(-1, 1)
+        self.n = len(self.data)
+        self.alpha = alpha
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.condensed = self._condensed_matrix() if self.n <= precompute_limit else None
+
+    def __len__(self):
+        return self.n
+
+    def _condensed_matrix(self):
+        """Upper triangle of the scaled distance matrix, as scipy's pdist lays it out."""
+        data = np.asarray(self.data, dtype=np.float64)
+        condensed = np.empty(self.n * (self.n - 1) // 2, dtype=np.float32)
+        start = 0
+        for i in range(self.n - 1):
+            row = np.sqrt(((data[i + 1:] - data[i]) ** 2).sum(axis=1)) / self.alpha
+            condensed[start:start + len(row)] = row
+            start += len(row)
+        return condensed
+
+    def _condensed_index(self, i, j):
+        """Position of the pair (i, j), i < j, in the condensed matrix."""
+        return self.n * i - i * (i + 1) // 2 + j - i - 1
+
+    def scaled_dissimilarities(self, row, rows):
+        """d(row, r) / alpha for every r in rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.condensed is not None:
+            low, high = np.minimum(row, rows), np.maximum(row, rows)
+            result = np.zeros(len(rows), dtype=np.float64)
+            different = low != high
+            result[different] = self.condensed[self._condensed_index(low[different], high[different])]
+            return result
+
+        result = np.empty(len(rows), dtype=np.float64)
+        missing = []
+        for k, other in enumerate(rows.tolist()):
+            key = (row, other) if row < other else (other, row)
+            value = self.cache.get(key)
+            if value is None:
+                missing.append(k)
+            else:
+                self.cache.move_to_end(key)
+                result[k] = value
+        self.hits += len(rows) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            others = rows[missing]
+            # Sorting the row indices keeps memory-mapped reads sequential
+            order = np.argsort(others)
+            vectors = np.asarray(self.data[others[order]], dtype=np.float64)
+            values = np.empty(len(missing), dtype=np.float64)
+            values[order] = np.sqrt(((vectors - np.asarray(self.data[row], dtype=np.float64)) ** 2).sum(axis=1))
+            values /= self.alpha
+            result[missing] = values
+            for other, value in zip(others.tolist(), values.tolist()):
+                self.cache[(row, other) if row < other else (other, row)] = value
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
@@ -0,0 +1,243 @@
+"""Array backend for ClusteringModel.
+
+Ants, carried objects and the per-type object grids live in typed NumPy arrays and
+one RandomActivation sweep (random permutation, then pick/drop/move per ant) runs
+inside a single compiled loop. Numba is optional: without it the functions below
+are plain Python and ClusteringModel keeps using the Mesa path.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that leaves the function interpreted."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+@njit(cache=True)
+def _seed(seed):
+    """Seed the RNG used inside compiled functions (numba keeps its own state)."""
+    np.random.seed(seed)
+
+
+@njit(cache=True)
+def _window_count(counts, object_type, x, y, radius):
+    """Objects of one type (or of all types if object_type < 0) around (x, y), center excluded."""
+    n_types, width, height = counts.shape
+    total = 0
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            if dx == 0 and dy == 0:
+                continue
+            cx = (x + dx) % width
+            cy = (y + dy) % height
+            if object_type >= 0:
+                total += counts[object_type, cx, cy]
+            else:
+                for t in range(n_types):
+                    total += counts[t, cx, cy]
+    return total
+
+
+@njit(cache=True)
+def _similarity(counts, object_type, x, y, radius, alpha, sigma_squared):
+    """f* for an object of object_type at (x, y) with the 0/1 type distance."""
+    n_same = _window_count(counts, object_type, x, y, radius)
+    n_other = _window_count(counts, -1, x, y, radius) - n_same
+    other_similarity = 1.0 - 1.0 / alpha
+    if n_other > 0 and other_similarity <= 0:
+        return 0.0
+    return (n_same + n_other * other_similarity) / sigma_squared
+
+
+@njit(cache=True)
+def _link(obj, x, y, obj_type, obj_x, obj_y, obj_next, cell_head, counts):
+    """Append obj to the object list of cell (x, y)."""
+    obj_x[obj] = x
+    obj_y[obj] = y
+    obj_next[obj] = -1
+    counts[obj_type[obj], x, y] += 1
+    head = cell_head[x, y]
+    if head < 0:
+        cell_head[x, y] = obj
+        return
+    while obj_next[head] >= 0:
+        head = obj_next[head]
+    obj_next[head] = obj
+
+
+@njit(cache=True)
+def _unlink(obj, obj_type, obj_x, obj_y, obj_next, cell_head, counts):
+    """Remove obj from the object list of its cell."""
+    x = obj_x[obj]
+    y = obj_y[obj]
+    counts[obj_type[obj], x, y] -= 1
+    if cell_head[x, y] == obj:
+        cell_head[x, y] = obj_next[obj]
+    else:
+        prev = cell_head[x, y]
+        while obj_next[prev] != obj:
+            prev = obj_next[prev]
+        obj_next[prev] = obj_next[obj]
+    obj_next[obj] = -1
+    obj_x[obj] = -1
+    obj_y[obj] = -1
+
+
+@njit(cache=True)
+def _nth_neighbor_object(n, x, y, obj_next, cell_head):
+    """The n-th object in the radius 1 Moore neighbourhood of (x, y), center excluded."""
+    width, height = cell_head.shape
+    for dx in range(-1, 2):
+        for dy in range(-1, 2):
+            if dx == 0 and dy == 0:
+                continue
+            obj = cell_head[(x + dx) % width, (y + dy) % height]
+            while obj >= 0:
+                if n == 0:
+                    return obj
+                n -= 1
+                obj = obj_next[obj]
+    return -1
+
+
+@njit(cache=True)
+def _sweep(order, ant_x, ant_y, ant_carry, ant_step,
+           obj_type, obj_x, obj_y, obj_next, cell_head, counts,
+           radius, alpha, sigma_squared, k_plus, k_minus):
+    """Activate the ants in order, mirroring AntAgent.step."""
+    width, height = cell_head.shape
+    for i in order:
+        x = ant_x[i]
+        y = ant_y[i]
+        carried = ant_carry[i]
+        if carried >= 0:
+            f = _similarity(counts, obj_type[carried], x, y, radius, alpha, sigma_squared)
+            p_drop = (f / (k_minus + f)) ** 2
+            if np.random.random() < p_drop:
+                _link(carried, x, y, obj_type, obj_x, obj_y, obj_next, cell_head, counts)
+                ant_carry[i] = -1
+        else:
+            n_objects = _window_count(counts, -1, x, y, 1)
+            if n_objects > 0:
+                under = cell_head[x, y]
+                if under >= 0:
+                    f = _similarity(counts, obj_type[under], x, y, radius, alpha, sigma_squared)
+                else:
+                    # Default similarity 1 for every neighbour if no object is under the ant
+                    f = _window_count(counts, -1, x, y, radius) / sigma_squared
+                p_pick = (k_plus / (k_plus + f)) ** 2
+                if np.random.random() < p_pick:
+                    obj = _nth_neighbor_object(np.random.randint(n_objects), x, y, obj_next, cell_head)
+                    _unlink(obj, obj_type, obj_x, obj_y, obj_next, cell_head, counts)
+                    ant_carry[i] = obj
+        step = ant_step[i]
+        ant_x[i] = (x + np.random.randint(-step, step + 1)) % width
+        ant_y[i] = (y + np.random.randint(-step, step + 1)) % height
+
+
+@njit(cache=True)
+def _step(ant_x, ant_y, ant_carry, ant_step,
+          obj_type, obj_x, obj_y, obj_next, cell_head, counts,
+          radius, alpha, sigma_squared, k_plus, k_minus):
+    """One RandomActivation step: shuffle the ants, then sweep."""
+    order = np.random.permutation(ant_x.shape[0])
+    _sweep(order, ant_x, ant_y, ant_carry, ant_step,
+           obj_type, obj_x, obj_y, obj_next, cell_head, counts,
+           radius, alpha, sigma_squared, k_plus, k_minus)
+
+
+class KernelState:
+    """Typed-array copy of a ClusteringModel that is stepped by the compiled kernel."""
+
+    def __init__(self, model, n_types=3, seed=None):
+        from agents import AntAgent
+
+        self.model = model
+        self.width, self.height = model.grid.width, model.grid.height
+        self.radius = int((np.sqrt(model.SIGMA_SQUARED) - 1) / 2)
+        if min(self.width, self.height) < 2 * self.radius + 1:
+            raise ValueError("Grid is smaller than the similarity window")
+
+        # Objects keep the ids of the grid's object store
+        self.ants = [a for a in model.schedule.agents if isinstance(a, AntAgent)]
+        self.objects = store = model.grid.objects
+
+        self.ant_x = np.array([a.pos[0] for a in self.ants], dtype=np.int64)
+        self.ant_y = np.array([a.pos[1] for a in self.ants], dtype=np.int64)
+        self.ant_step = np.array([a.step_size for a in self.ants], dtype=np.int64)
+        self.ant_carry = np.array([a.carrying.unique_id if a.carrying is not None else -1 for a in self.ants],
+                                  dtype=np.int64)
+
+        n_objects = len(store)
+        self.obj_type = store.fields["object_type"].astype(np.int64)
+        self.obj_x = np.full(n_objects, -1, dtype=np.int64)
+        self.obj_y = np.full(n_objects, -1, dtype=np.int64)
+        self.obj_next = np.full(n_objects, -1, dtype=np.int64)
+        self.cell_head = np.full((self.width, self.height), -1, dtype=np.int64)
+        self.counts = np.zeros((max(n_types, int(self.obj_type.max(initial=0)) + 1), self.width, self.height),
+                               dtype=np.int64)
+        # Link objects in grid order so the head of each cell list is the store's "first" object
+        for cell, bucket in enumerate(store.buckets):
+            x, y = divmod(cell, self.height)
+            for i in bucket:
+                _link(i, x, y, self.obj_type, self.obj_x, self.obj_y, self.obj_next, self.cell_head, self.counts)
+
+        self.seed = seed  # of numba's generator, whose state cannot be read back
+        if seed is not None:
+            _seed(seed)
+
+    def step(self):
+        """Advance the array state by one RandomActivation sweep."""
+        m = self.model
+        _step(self.ant_x, self.ant_y, self.ant_carry, self.ant_step,
+              self.obj_type, self.obj_x, self.obj_y, self.obj_next, self.cell_head, self.counts,
+              self.radius, float(m.ALPHA), float(m.SIGMA_SQUARED),
+              float(m.PICKUP_THRESHOLD), float(m.DROP_THRESHOLD))
+
+    def object_slots(self):
+        """Index of each object in its cell list (-1 while carried), like bucket_slots for the store."""
+        slots = np.full(len(self.obj_x), -1, dtype=np.int32)
+        for x, y in zip(*np.nonzero(self.cell_head >= 0)):
+            obj, slot = self.cell_head[x, y], 0
+            while obj >= 0:
+                slots[obj] = slot
+                obj, slot = self.obj_next[obj], slot + 1
+        return slots
+
+    def write_back(self):
+        """Mirror the array state into the Mesa grid, agents and object store.
+
+        Every object whose store position differs from the arrays is moved, whatever
+        happened to it since the last write-back (e.g. picked up and dropped elsewhere).
+        Objects placed into a cell are appended in the order of its object list.
+        """
+        grid = self.model.grid
+        store = self.objects
+        moved = np.flatnonzero((store.x != self.obj_x) | (store.y != self.obj_y)).tolist()
+        targets = {}
+        for i in moved:
+            if store.x[i] >= 0:
+                grid.remove_object(i)
+            if self.obj_x[i] >= 0:
+                targets.setdefault((int(self.obj_x[i]), int(self.obj_y[i])), set()).add(i)
+        for (x, y), ids in targets.items():
+            obj = self.cell_head[x, y]
+            while obj >= 0:
+                if obj in ids:
+                    grid.place_object(int(obj), (x, y))
+                obj = self.obj_next[obj]
+
+        for i, ant in enumerate(self.ants):
+            carried = int(self.ant_carry[i])
+            if carried != (ant.carrying.unique_id if ant.carrying is not None else -1):
+                ant.carrying = store.view(carried) if carried >= 0 else None
+            pos = (int(self.ant_x[i]), int(self.ant_y[i]))
+            if ant.pos != pos:
+                grid.move_agent(ant, pos)
@@ -1,32 +1,166 @@
+import os
+import sys
+from functools import partial
+
 from mesa import Model
-from mesa.space import MultiGrid
 from mesa.time import RandomActivation
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
 from agents import AntAgent, ObjectAgent
-import random
+from cache import ProbabilityCache
+from dataset import Dataset
+from space import ClusteringGrid
+from common.convergence import ConvergenceMonitor, same_type_fraction
+from common.trajectory import TrajectoryRecorder
+import kernel
+import parallel
+import numpy as np
+import warnings
 
 class ClusteringModel(Model):
-    def __init__(self, width, height, num_agents=20, num_objects=200):
-        super().__init__()
-        self.grid = MultiGrid(width, height, torus=True)
-        self.schedule = RandomActivation(self)
-
+    def __init__(self, width, height, num_agents=20, num_objects=200, backend="mesa", data=None, labels=None,
+                 n_workers=None, convergence_window=None, convergence_tolerance=0.05, cache=True,
+                 neighborhood_samples=None, seed=None, trajectory=None, radius=2):
+        super().__init__(rng=seed)
+        if neighborhood_samples and data is not None:
+            raise ValueError("Sampled neighbourhoods only support typed objects, not datasets")
         # Parameters for agents
         self.PICKUP_THRESHOLD = 0.1
         self.DROP_THRESHOLD = 0.3
         self.ALPHA = 0.5
-        self.SIGMA_SQUARED = 25
+        self.SIGMA_SQUARED = (2 * radius + 1) ** 2  # 25 for the default radius 2
+
+        # Sampled neighbourhoods decide the f* gate from per-type window counts, kept in O(1)
+        self.grid = ClusteringGrid(width, height, torus=True, object_view=partial(ObjectAgent, self),
+                                   window_radius=self.radius if neighborhood_samples else None)
+        self.schedule = RandomActivation(self)
 
-        # Object creation
-        for _ in range(num_objects):
-            object_type = random.choice(range(3))  # three types of objects, e.g. 0, 1 and 2
-            obj = ObjectAgent(self, object_type)
-            self.grid.place_agent(obj, (random.randrange(self.grid.width), random.randrange(self.grid.height)))
+        self.pickups = 0
+        self.drops = 0
+        self.convergence = None
+        if convergence_window:
+            self.convergence = ConvergenceMonitor(convergence_window, convergence_tolerance)
+
+        # Objects either have one of three types or stand for the rows of a dataset
+        # (array or path to a .npy file, which is memory-mapped), optionally with labels.
+        # Objects are ids in the grid's object store, not agents. Positions and types are
+        # drawn for all of them at once and placed in one pass.
+        self.dataset = None
+        if data is not None:
+            self.dataset = Dataset(data, self.ALPHA)
+            num_objects = len(self.dataset)
+            if labels is not None:
+                labels = np.load(labels, mmap_mode="r") if isinstance(labels, str) else np.asarray(labels)
+                object_types = np.asarray(labels[:num_objects], dtype=int)
+            else:
+                object_types = 0
+            objects = self.grid.objects.add(num_objects, object_type=object_types, row=np.arange(num_objects))
+        else:
+            object_types = self.rng.integers(0, 3, num_objects)  # three types of objects, e.g. 0, 1 and 2
+            objects = self.grid.objects.add(num_objects, object_type=object_types)
+        self.grid.place_objects(objects, self._random_positions(num_objects))
 
         # Creating ants
-        for _ in range(num_agents):
-            ant = AntAgent(self)
-            self.grid.place_agent(ant, (random.randrange(self.grid.width), random.randrange(self.grid.height)))
+        ants = [AntAgent(self) for _ in range(num_agents)]
+        self.grid.place_agents(ants, self._random_positions(num_agents))
+        for ant in ants:
             self.schedule.add(ant)
 
+        # With neighborhood_samples, the similarity sum of f* is estimated from that many
+        # random cells of the similarity window instead of all of them (see
+        # common.space.sampling_error); whether f* is 0 is still decided exactly. The
+        # estimates are random, so they are not cached.
+        self.neighborhood_samples = neighborhood_samples
+
+        # f*, p_pick and p_drop of the Mesa ants per (cell, carried key), recomputed only
+        # once an object was placed or removed within the similarity radius of the cell
+        self.cache = None
+        if cache and not neighborhood_samples:
+            self.cache = ProbabilityCache(self.grid, self.radius)
+
+        self.kernel = None
+        self.sync_grid = True
+        self._start_backend(backend, n_workers)
+
+        self.recorder = None
+        if trajectory:
+            self.enable_trajectory(None if trajectory is True else trajectory)
+
+    def _start_backend(self, backend, n_workers=None, kernel_seed=None):
+        """Set up the stepping backend for the agents currently on the grid."""
+        # Optional compiled backends: the arrays in self.kernel become the model state and
+        # the Mesa grid is only a mirror of it (kept in sync while sync_grid is True).
+        # "parallel" steps the arrays from n_workers processes on strips of the torus.
+        # The compiled code draws from numba's own generator, seeded from self.rng unless
+        # kernel_seed is given.
+        self.backend = backend
+        self.n_workers = n_workers
+        if backend in ("kernel", "parallel"):
+            if self.dataset is not None:
+                raise ValueError("The kernel backends only support typed objects, not datasets")
+            if self.neighborhood_samples:
+                raise ValueError("The kernel backends only compute exact neighbourhoods")
+            if not kernel.HAVE_NUMBA:
+                warnings.warn("numba is not installed, falling back to the Mesa backend")
+                self.backend = "mesa"
+            elif backend == "parallel":
+                seed = self._kernel_seed() if kernel_seed is None else kernel_seed
+                self.kernel = parallel.ParallelKernelState(self, n_workers, seed=seed)
+            else:
+                seed = self._kernel_seed() if kernel_seed is None else kernel_seed
+                self.kernel = kernel.KernelState(self, seed=seed)
+        elif backend != "mesa":
+            raise ValueError(f"Unknown backend: {backend}")
+
+    def enable_trajectory(self, path=None, keyframe_interval=100):
+        """Record the current state and that after every step to path; returns the recorder."""
+        self.refresh_grid()
+        self.recorder = TrajectoryRecorder(self, path, keyframe_interval)
+        return self.recorder
+
+    def refresh_grid(self):
+        """Mirror the kernel arrays into the Mesa grid, which is stale while sync_grid is off."""
+        if self.kernel is not None and not self.sync_grid:
+            self.kernel.write_back()
+
+    @property
+    def radius(self):
+        """Radius of the similarity window, (2r + 1)^2 = SIGMA_SQUARED."""
+        return int((np.sqrt(self.SIGMA_SQUARED) - 1) / 2)
+
+    def _kernel_seed(self):
+        return int(self.rng.integers(2 ** 32))
+
+    def _random_positions(self, n):
+        """n uniformly random cells as an (n, 2) array."""
+        return np.column_stack((self.rng.integers(0, self.grid.width, n),
+                                self.rng.integers(0, self.grid.height, n)))
+
+    def clustering_quality(self):
+        """Share of same-type pairs among neighbouring objects on the grid."""
+        if self.kernel is not None:
+            return same_type_fraction(self.kernel.counts)
+        objects = self.grid.objects
+        placed = objects.placed()
+        object_types = objects.fields["object_type"][placed]
+        counts = np.zeros((object_types.max(initial=0) + 1, self.grid.width, self.grid.height))
+        np.add.at(counts, (object_types, objects.x[placed], objects.y[placed]), 1)
+        return same_type_fraction(counts)
+
     def step(self):
-        self.schedule.step()
\ No newline at end of file
+        self.pickups = self.drops = 0
+        if self.kernel is not None:
+            carrying = self.kernel.ant_carry >= 0
+            self.kernel.step()
+            carrying_now = self.kernel.ant_carry >= 0
+            self.pickups = int((~carrying & carrying_now).sum())
+            self.drops = int((carrying & ~carrying_now).sum())
+            if self.sync_grid:
+                self.kernel.write_back()
+        else:
+            self.schedule.step()
+        if self.recorder is not None:
+            self.refresh_grid()
+            self.recorder.record()
+        if self.convergence is not None:
+            self.convergence.update(self, self.pickups, self.drops, self.schedule.get_agent_count(),
+                                    self.clustering_quality)
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""Multi-process backend for ClusteringModel.
+
+The torus is split into vertical strips, one per worker process, and the kernel arrays
+(ants, carried objects, per-type object counts) live in shared memory. Every strip is
+halved; a step runs in two phases, first the ants in the left halves of all strips and
+then those in the right halves, with a barrier in between. An ant reads its RADIUS
+window and writes at most one cell away, so as long as every half is wider than RADIUS
+the concurrently active halves never touch the same cells. The halo strips of width
+RADIUS are read in place from shared memory, and the barrier is the halo exchange.
+
+Ants belong to the strip they stand in at the start of a phase, so ants and the objects
+they carry migrate between workers simply by walking across a boundary. Each ant is
+stepped once per step with the usual pick/drop probabilities; within a half the ants
+are activated in random order.
+"""
+import multiprocessing as mp
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from kernel import KernelState, njit, _seed, _sweep
+
+_SHARED = ("ant_x", "ant_y", "ant_carry", "ant_step", "ant_stepped",
+           "obj_type", "obj_x", "obj_y", "obj_next", "cell_head", "counts")
+
+
+@njit(cache=True)
+def _phase(lo, hi, ant_stepped, ant_x, ant_y, ant_carry, ant_step,
+           obj_type, obj_x, obj_y, obj_next, cell_head, counts,
+           radius, alpha, sigma_squared, k_plus, k_minus):
+    """Step the ants not yet stepped whose column lies in [lo, hi), in random order."""
+    active = np.empty(ant_x.shape[0], dtype=np.int64)
+    n = 0
+    for i in range(ant_x.shape[0]):
+        if ant_stepped[i] == 0 and lo <= ant_x[i] < hi:
+            active[n] = i
+            n += 1
+    order = active[:n][np.random.permutation(n)]
+    for i in order:
+        ant_stepped[i] = 1
+    _sweep(order, ant_x, ant_y, ant_carry, ant_step,
+           obj_type, obj_x, obj_y, obj_next, cell_head, counts,
+           radius, alpha, sigma_squared, k_plus, k_minus)
+
+
+def _attach(specs):
+    """Open the shared memory blocks described by specs and return (blocks, arrays)."""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+
+def _worker(specs, halves, params, seed, start, phase_done, done, stop):
+    """Worker process loop: wait for a step, run both phases on the own strip."""
+    blocks, a = _attach(specs)
+    _seed(seed)
+    while True:
+        start.wait()
+        if stop.value:
+            break
+        for lo, hi in halves:
+            _phase(lo, hi, a["ant_stepped"], a["ant_x"], a["ant_y"], a["ant_carry"], a["ant_step"],
+                   a["obj_type"], a["obj_x"], a["obj_y"], a["obj_next"], a["cell_head"], a["counts"],
+                   *params)
+            phase_done.wait()
+        done.wait()
+    del a
+    for block in blocks:
+        block.close()
+
+
+def _shutdown(processes, start, stop, blocks):
+    """Stop the workers and release the shared memory."""
+    stop.value = True
+    try:
+        start.wait(timeout=5)
+    except Exception:
+        pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass  # arrays still point into the block; unlinking alone frees it once they are gone
+        block.unlink()
+
+
+class ParallelKernelState(KernelState):
+    """KernelState whose arrays are in shared memory and stepped by worker processes."""
+
+    def __init__(self, model, n_workers=None, seed=None):
+        super().__init__(model)
+        self.seed = seed
+        n_workers = n_workers or mp.cpu_count()
+        # Each strip has two halves that must be wider than the similarity radius
+        n_workers = max(1, min(n_workers, self.width // (2 * (self.radius + 1))))
+        self.n_workers = n_workers
+
+        self.ant_stepped = np.zeros(len(self.ants), dtype=np.uint8)
+        self._blocks, specs = [], {}
+        for name in _SHARED:
+            array = getattr(self, name)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            setattr(self, name, shared)
+            self._blocks.append(block)
+            specs[name] = (block.name, array.shape, array.dtype.str)
+
+        bounds = np.linspace(0, self.width, n_workers + 1).astype(int)
+        params = (self.radius, float(model.ALPHA), float(model.SIGMA_SQUARED),
+                  float(model.PICKUP_THRESHOLD), float(model.DROP_THRESHOLD))
+        seeds = np.random.SeedSequence(seed).generate_state(n_workers)
+
+        context = mp.get_context()
+        self._start = context.Barrier(n_workers + 1)
+        self._done = context.Barrier(n_workers + 1)
+        self._phase_done = context.Barrier(n_workers)
+        self._stop = context.Value("b", False)
+        self._processes = []
+        for w in range(n_workers):
+            lo, hi = bounds[w], bounds[w + 1]
+            mid = (lo + hi) // 2
+            process = context.Process(
+                target=_worker,
+                args=(specs, ((lo, mid), (mid, hi)), params, int(seeds[w]),
+                      self._start, self._phase_done, self._done, self._stop),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._start, self._stop,
+                                           self._blocks)
+
+    def step(self):
+        """Advance the shared state by one step on all workers."""
+        self.ant_stepped[:] = 0
+        self._start.wait()
+        self._done.wait()
+
+    def close(self):
+        """Stop the workers and free the shared memory; the state stays readable."""
+        for name in _SHARED:
+            setattr(self, name, np.array(getattr(self, name)))
+        self._finalizer()
@@ -1,11 +1,16 @@
+import os
+import sys
+
 from matplotlib.figure import Figure
 from mesa.visualization.utils import update_counter
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
 from model import ClusteringModel
 from mesa.visualization import SolaraViz, make_space_component
 import solara
 
 from agents import AntAgent
+from common.dashboard import TrajectoryGraph
 import agents
 
 # Model parameters
@@ -54,21 +59,34 @@ model_params = {
         "min": 10,
         "max": 200,
         "step": 1,
-    }
-
+    },
+    "trajectory": {
+        "type": "Checkbox",
+        "value": False,
+        "label": "Record trajectory",
+    },
 }
-initial_model = ClusteringModel(
-    width=GRID_SIZE,
-    height=GRID_SIZE,
-    num_agents=NUM_AGENTS,
-    num_objects=NUM_OBJECTS
-)
 SpaceGraph = make_space_component(agent_portrayal)
 
-page = SolaraViz(
-    initial_model,
-    components=[SpaceGraph],
-    model_params=model_params,
-    name="Enhanced Ant Clustering Visualization"
-)
-page
\ No newline at end of file
+
+@solara.component
+def Page():
+    """Dashboard page; the model is built on first render instead of at import time."""
+    initial_model = solara.use_memo(
+        lambda: ClusteringModel(
+            width=GRID_SIZE,
+            height=GRID_SIZE,
+            num_agents=NUM_AGENTS,
+            num_objects=NUM_OBJECTS
+        ),
+        dependencies=[],
+    )
+    SolaraViz(
+        initial_model,
+        components=[SpaceGraph, TrajectoryGraph],
+        model_params=model_params,
+        name="Enhanced Ant Clustering Visualization"
+    )
+
+
+Page
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.space import ObjectGrid, ObjectView, WindowCounts
+
+
+class ClusteringGrid(ObjectGrid):
+    """ObjectGrid whose objects have an object_type and a dataset row (-1 if none).
+
+    With window_radius, windows is a WindowCounts of the objects of num_types types within
+    that radius of every cell, so window counts are O(1) lookups (None otherwise).
+    The observers are e.g. used to invalidate cached probabilities around changes.
+    """
+
+    def __init__(self, width, height, torus, object_view=None, num_types=3, window_radius=None):
+        super().__init__(width, height, torus, fields={"object_type": np.int16, "row": np.int64},
+                         object_view=object_view)
+        self.windows = None
+        if window_radius is not None:
+            self.windows = WindowCounts(self, window_radius, num_types)
+
+    def _count(self, agent, pos, delta, obj=None):
+        if obj is not None and self.windows is not None:
+            self.windows.add(self.objects.fields["object_type"][obj], pos, delta)
+        super()._count(agent, pos, delta, obj)
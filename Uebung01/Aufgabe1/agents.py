@@ -1,11 +1,15 @@
-import random
+import os
+import sys
+
 from mesa import Agent
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from space import ObjectView
+from common.streams import spawn_stream
 
 
-class ParticleAgent(Agent):
-    """An agent representing a particle"""
-    def __init__(self, model):
-        super().__init__(model)
+class ParticleAgent(ObjectView):
+    """A particle: a view of one id of the grid's object store (particles are no Mesa agents)"""
+    __slots__ = ()
 
 
 class AntAgent(Agent):
@@ -15,34 +19,44 @@ class AntAgent(Agent):
         self.carrying = None
         self.step_size = step_size
         self.jump_distance = jump_distance
+        self.wake = 0  # first step this ant acts in again after a fast-forwarded walk
+        self.stream = spawn_stream(model.rng)
 
     def step(self):
+        if self.model.steps < self.wake:
+            self.model.idle_walks.advance(self)  # skipped: still on a fast-forwarded walk
+            return
         # If the ant is not carrying a load and is on a cage with a particle
-        cellmates = self.model.grid.get_cell_list_contents([self.pos])
-        particles = [obj for obj in cellmates if isinstance(obj, ParticleAgent)]
+        grid = self.model.grid
+        particles = grid.objects.at(self.pos)
         if not self.carrying and particles:
-            self.carrying = particles[0]  # Take the particle
-            self.model.grid.remove_agent(self.carrying)
+            self.carrying = grid.objects.view(particles[0])  # Take the particle
+            grid.remove_agent(self.carrying)
+            self.model.pickups += 1
             self.jump()
         elif self.carrying:
             # If ant are carrying a load and find an empty seat
-            empty_neighbors = [pos for pos in self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-                               if self.model.grid.is_cell_empty(pos)]
-            if empty_neighbors:
-                new_position = random.choice(empty_neighbors)
-                self.model.grid.place_agent(self.carrying, new_position)
+            cells = grid.neighborhood(self.pos)
+            empty_neighbors = cells[grid.occupancy.ravel()[cells] == 0]
+            if len(empty_neighbors):
+                new_position = divmod(int(self.stream.choice(empty_neighbors)), grid.height)
+                grid.place_agent(self.carrying, new_position)
                 self.carrying = None  # Drop the load
+                self.model.drops += 1
                 self.jump()
+        elif self.model.idle_walks is not None:
+            # Walk on until the next particle in one go
+            self.model.idle_walks.walk(self)
         else:
             # Move by step_size in a random direction
             self.move()
     def jump(self):
-        new_position = (self.pos[0] + random.randint(-self.jump_distance, self.jump_distance),
-                        self.pos[1] + random.randint(-self.jump_distance, self.jump_distance))
+        new_position = (self.pos[0] + self.stream.randint(-self.jump_distance, self.jump_distance),
+                        self.pos[1] + self.stream.randint(-self.jump_distance, self.jump_distance))
         self.model.grid.move_agent(self, new_position)
 
     def move(self):
         """ Step on step_size in a random direction. """
-        new_position = (self.pos[0] + random.randint(-self.step_size, self.step_size),
-                        self.pos[1] + random.randint(-self.step_size, self.step_size))
+        new_position = (self.pos[0] + self.stream.randint(-self.step_size, self.step_size),
+                        self.pos[1] + self.stream.randint(-self.step_size, self.step_size))
         self.model.grid.move_agent(self, new_position)
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""Checkpoint/restore for AntClusteringModel.
+
+The model state is written as compact arrays (positions, carrying links, ant ids, per-ant
+parameters and random streams, the model's RNG states, the convergence monitor, step
+counters and the collected series) into one compressed .npz file, and restored into an
+identical model without pickling Mesa agents. The fast-forwarded walks of skipping ants
+are stored concatenated, with their start and length.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from agents import AntAgent
+from model import AntClusteringModel
+from common.checkpoint import (bucket_slots, cell_slots, pack_convergence, pack_random_states,
+                               place_in_bucket_order, place_in_cell_order, restore_ids, unpack_convergence,
+                               unpack_random_states)
+from common.streams import pack_streams, unpack_streams
+
+
+def save(model, path):
+    """Write the state of model to a compressed .npz file at path."""
+    ants = list(model.schedule.agents)
+    particles = model.grid.objects
+
+    arrays = {
+        "width": model.grid.width,
+        "height": model.grid.height,
+        "particle_pos": np.column_stack((particles.x, particles.y)).astype(np.int32),
+        "particle_slot": bucket_slots(particles),
+        "ant_id": np.array([a.unique_id for a in ants], dtype=np.int64),
+        "ant_pos": np.array([a.pos for a in ants], dtype=np.int32).reshape(-1, 2),
+        "ant_slot": cell_slots(model.grid, ants),
+        "ant_carry": np.array([a.carrying.unique_id if a.carrying else -1 for a in ants], dtype=np.int32),
+        "ant_step_size": np.array([a.step_size for a in ants], dtype=np.int32),
+        "ant_jump_distance": np.array([a.jump_distance for a in ants], dtype=np.int32),
+        "steps": model.steps,
+        "schedule_steps": model.schedule.steps,
+        "schedule_time": model.schedule.time,
+        "series_names": np.array(list(model.datacollector.model_vars), dtype=str),
+        "ant_wake": np.array([a.wake for a in ants], dtype=np.int64),
+    }
+    if model.idle_walks is not None:
+        walks = [model.idle_walks.walks.get(a) for a in ants]
+        arrays["walk_start"] = np.array([w[0] if w else -1 for w in walks], dtype=np.int64)
+        arrays["walk_length"] = np.array([len(w[1]) if w else 0 for w in walks], dtype=np.int64)
+        arrays["walk_x"] = np.concatenate([w[1] for w in walks if w] + [np.empty(0)]).astype(np.int32)
+        arrays["walk_y"] = np.concatenate([w[2] for w in walks if w] + [np.empty(0)]).astype(np.int32)
+        arrays["walk_skipped"] = model.idle_walks.skipped
+    for i, values in enumerate(model.datacollector.model_vars.values()):
+        arrays[f"series_{i}"] = np.asarray(values)
+    arrays.update(pack_streams([a.stream for a in ants]))
+    arrays.update(pack_random_states(model))
+    arrays.update(pack_convergence(model.convergence))
+    np.savez_compressed(path, **arrays)
+
+
+def load(path):
+    """Rebuild the model saved at path."""
+    with np.load(path, allow_pickle=False) as f:
+        data = dict(f)
+
+    model = AntClusteringModel(num_agents=0, particle_density=0, fast_forward="walk_start" in data)
+    particles = model.grid.objects.add(len(data["particle_pos"]))
+    place_in_bucket_order(model.grid, particles, data["particle_pos"], data["particle_slot"])
+    ants = [AntAgent(model, step_size=int(s), jump_distance=int(j))
+            for s, j in zip(data["ant_step_size"], data["ant_jump_distance"])]
+    if "ant_id" in data:
+        restore_ids(model, ants, data["ant_id"].tolist())
+    place_in_cell_order(model.grid, ants, data["ant_pos"], data["ant_slot"])
+    model.num_agents = len(ants)
+    for ant, carried in zip(ants, data["ant_carry"].tolist()):
+        ant.carrying = model.grid.objects.view(carried) if carried >= 0 else None
+        model.schedule.add(ant)
+    for ant, wake in zip(ants, data.get("ant_wake", np.zeros(len(ants), dtype=np.int64)).tolist()):
+        ant.wake = wake
+    if model.idle_walks is not None:
+        ends = np.cumsum(data["walk_length"])
+        for ant, start, length, end in zip(ants, data["walk_start"].tolist(), data["walk_length"].tolist(),
+                                           ends.tolist()):
+            if start >= 0:
+                model.idle_walks.track(ant, start, data["walk_x"][end - length:end].astype(np.int64),
+                                       data["walk_y"][end - length:end].astype(np.int64))
+        model.idle_walks.skipped = int(data["walk_skipped"])
+
+    model.steps = int(data["steps"])
+    model.schedule.steps = int(data["schedule_steps"])
+    model.schedule.time = data["schedule_time"].item()
+    for i, name in enumerate(data["series_names"].tolist()):
+        model.datacollector.model_vars[name] = data[f"series_{i}"].tolist()
+
+    unpack_random_states(model, data)
+    unpack_convergence(model, data)
+    unpack_streams([a.stream for a in ants], data)
+    return model
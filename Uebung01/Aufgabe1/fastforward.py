@@ -0,0 +1,99 @@
+"""Event-driven fast-forward of idle ants for AntClusteringModel.
+
+An idle ant on a cell without a particle does nothing but AntAgent.move, step after
+step, until it lands on a particle. IdleWalks draws that walk BLOCK steps at a time
+from the same distribution (uniform displacements in [-step_size, step_size] per axis)
+and finds its first position on a particle for the current layout. Until the step in
+which it would find the particle the ant only follows the drawn walk, one position per
+step, so the other ants' drops, the dashboard and the trajectory see it where it would
+be without fast-forwarding; the random draws and particle checks of those steps are
+skipped.
+
+The layout changes while ants skip: a particle dropped on the remaining walk of a
+skipping ant cuts the walk short there; if the particle at the end of a walk is taken
+first, the ant finds the cell empty when it wakes and walks on, as it would.
+"""
+import numpy as np
+
+BLOCK = 64  # walk steps drawn at once
+HORIZON = 4096  # longest skip; an ant that finds no particle by then wakes and draws again
+
+
+class IdleWalks:
+    """The fast-forwarded walks of a model's idle ants, kept up to date with the particles."""
+
+    def __init__(self, model, block=BLOCK, horizon=HORIZON):
+        self.model = model
+        self.block = block
+        self.horizon = horizon
+        self.walks = {}  # skipping ant -> (step its walk started, x and y after each step of it)
+        self.crossers = {}  # cell id -> ants whose walk crosses the cell before its end
+        self.skipped = 0  # ant steps skipped so far
+        model.grid.observers.append(self.particle_changed)
+
+    def walk(self, ant):
+        """Move ant as AntAgent.move does until it lands on a particle, all in this step."""
+        grid = self.model.grid
+        x, y = ant.pos
+        xs, ys = [], []
+        for _ in range(0, self.horizon, self.block):
+            d = ant.stream.generator.integers(-ant.step_size, ant.step_size + 1, (2, self.block))
+            block_x = (x + np.cumsum(d[0])) % grid.width
+            block_y = (y + np.cumsum(d[1])) % grid.height
+            hits = np.flatnonzero(grid.particles[block_x, block_y])
+            if len(hits):
+                xs.append(block_x[:hits[0] + 1])
+                ys.append(block_y[:hits[0] + 1])
+                break
+            xs.append(block_x)
+            ys.append(block_y)
+            x, y = block_x[-1], block_y[-1]
+        xs, ys = np.concatenate(xs), np.concatenate(ys)
+        self.skipped += len(xs) - 1
+        self.skip(ant, self.model.steps, xs, ys)
+
+    def skip(self, ant, start, xs, ys):
+        """Let ant follow its walk xs, ys (begun in step start) until it gets to the end."""
+        self.forget(ant)
+        ant.wake = start + len(xs)
+        self.track(ant, start, xs, ys)
+        self.advance(ant)
+
+    def advance(self, ant):
+        """Move a skipping ant to the position of its walk in the current step."""
+        start, xs, ys = self.walks[ant]
+        i = self.model.steps - start
+        pos = (int(xs[i]), int(ys[i]))
+        if ant.pos != pos:
+            self.model.grid.move_agent(ant, pos)
+
+    def track(self, ant, start, xs, ys):
+        """Register the walk of ant, so that drops on the cells it crosses cut it short."""
+        self.walks[ant] = start, xs, ys
+        for cell in set((xs[:-1] * self.model.grid.height + ys[:-1]).tolist()):
+            self.crossers.setdefault(cell, set()).add(ant)
+
+    def forget(self, ant):
+        """Drop the walk of ant, if it has one, from the walks and the crossed cells."""
+        walk = self.walks.pop(ant, None)
+        if walk is not None:
+            _, xs, ys = walk
+            for cell in set((xs[:-1] * self.model.grid.height + ys[:-1]).tolist()):
+                self.crossers[cell].discard(ant)
+
+    def particle_changed(self, i, pos, delta):
+        """Cut short the walks that cross a particle newly placed at pos later on."""
+        if delta < 0:
+            return
+        step = self.model.steps
+        for ant in list(self.crossers.get(pos[0] * self.model.grid.height + pos[1], ())):
+            if ant.wake <= step:
+                self.forget(ant)  # awake again
+                continue
+            start, xs, ys = self.walks[ant]
+            ahead = step - start  # the positions from here on are only checked in later steps
+            crossed = np.flatnonzero((xs[ahead:-1] == pos[0]) & (ys[ahead:-1] == pos[1]))
+            if len(crossed):
+                end = ahead + int(crossed[0]) + 1
+                self.skipped -= len(xs) - end
+                self.skip(ant, start, xs[:end], ys[:end])
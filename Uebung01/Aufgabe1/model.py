@@ -1,9 +1,18 @@
-import random
+import os
+import sys
+from functools import partial
+
 from mesa import Model
-from mesa.space import MultiGrid
 from mesa.time import SimultaneousActivation
 from mesa.datacollection import DataCollector
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
 from agents import ParticleAgent, AntAgent
+from space import ClusteringGrid
+from common.convergence import ConvergenceMonitor, neighbour_density
+from fastforward import IdleWalks
+from common.profiling import StepProfiler
+from common.trajectory import TrajectoryRecorder
+import numpy as np
 
 def count_particles(model):
     particles = sum(isinstance(agent, ParticleAgent) for agent in model.schedule.agents)
@@ -13,27 +22,39 @@ def count_particles(model):
 
 class AntClusteringModel(Model):
     """Ant Clustering Model with Data Collection for Visualization"""
-    def __init__(self, num_agents=50, particle_density=0.1, step_size=1, jump_distance=5, central_init=False):
-        super().__init__()
+    def __init__(self, num_agents=50, particle_density=0.1, step_size=1, jump_distance=5, central_init=False,
+                 convergence_window=None, convergence_tolerance=0.05, seed=None, profile=False,
+                 trajectory=None, fast_forward=False):
+        super().__init__(rng=seed)
         self.num_agents = num_agents
-        self.grid = MultiGrid(50, 50, torus=True)
+
+        self.pickups = 0
+        self.drops = 0
+        self.convergence = None
+        if convergence_window:
+            self.convergence = ConvergenceMonitor(convergence_window, convergence_tolerance)
+        self.grid = ClusteringGrid(50, 50, torus=True, object_view=partial(ParticleAgent, self))
         self.schedule = SimultaneousActivation(self)
 
-        # Populate grid with particles
-        for _, coords in self.grid.coord_iter():
-            if random.random() < particle_density:
-                particle = ParticleAgent(self)
-                self.grid.place_agent(particle, coords)
+        # Populate grid with particles, one uniform per cell drawn at once; particles are
+        # ids in the grid's object store, not agents
+        cells = np.argwhere(self.rng.random((self.grid.width, self.grid.height)) < particle_density)
+        self.grid.place_objects(self.grid.objects.add(len(cells)), cells)
 
         # Add ant agents to the grid
+        positions = self.rng.integers(0, 50, (self.num_agents, 2))
         for i in range(self.num_agents):
             ant = AntAgent(self, step_size=step_size, jump_distance=jump_distance)
             if central_init:
                 self.grid.place_agent(ant, (25, 25))
             else:
-                self.grid.place_agent(ant, (random.randint(0, 49), random.randint(0, 49)))
+                self.grid.place_agent(ant, tuple(positions[i].tolist()))
             self.schedule.add(ant)
 
+        # With fast_forward, idle ants walk on to their next particle in one go and skip
+        # the steps in between (see fastforward.py)
+        self.idle_walks = IdleWalks(self) if fast_forward else None
+
         # Set up data collection
         self.datacollector = DataCollector(
             model_reporters={"Particles": lambda m: count_particles(m)["Particles"],
@@ -41,7 +62,50 @@ class AntClusteringModel(Model):
                              "Idle Ants": lambda m: count_particles(m)["Idle Ants"]},
         )
 
+        self.profiler = None
+        if profile:
+            self.enable_profiling()
+
+        self.recorder = None
+        if trajectory:
+            self.enable_trajectory(None if trajectory is True else trajectory)
+
+    def enable_profiling(self):
+        """Time the phases of every step and count the hot-path operations; returns the profiler."""
+        profiler = self.profiler = StepProfiler()
+        profiler.instrument(self.grid.objects, "at", "neighbours", counter="neighbour_queries")
+        profiler.instrument(self.grid, "neighborhood", "neighbours", counter="cells_probed", per_call=len)
+        profiler.instrument(self.grid, "place_agent", "grid_mutation")
+        profiler.instrument(self.grid, "remove_agent", "grid_mutation")
+        profiler.instrument(self.datacollector, "collect", "collect")
+        if self.idle_walks is not None:
+            profiler.instrument(self.idle_walks, "walk", "move", counter="fast_forwards")
+            profiler.instrument(self.idle_walks, "advance", "move")
+        for ant in self.schedule.agents:
+            profiler.instrument(ant, "move", "move")
+            profiler.instrument(ant, "jump", "move", counter="jumps")
+        profiler.instrument_step(self)
+        return profiler
+
+    def enable_trajectory(self, path=None, keyframe_interval=100):
+        """Record the current state and that after every step to path; returns the recorder."""
+        self.recorder = TrajectoryRecorder(self, path, keyframe_interval)
+        return self.recorder
+
+    def clustering_quality(self):
+        """Average share of occupied neighbour cells around the particles on the grid."""
+        objects = self.grid.objects
+        placed = objects.placed()
+        occupancy = np.zeros((self.grid.width, self.grid.height))
+        occupancy[objects.x[placed], objects.y[placed]] = 1
+        return neighbour_density(occupancy)
+
     def step(self):
         """Advance the model by one step and collect data."""
         self.datacollector.collect(self)
+        self.pickups = self.drops = 0
         self.schedule.step()
+        if self.recorder is not None:
+            self.recorder.record()
+        if self.convergence is not None:
+            self.convergence.update(self, self.pickups, self.drops, self.num_agents, self.clustering_quality)
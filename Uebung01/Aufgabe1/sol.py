@@ -1,10 +1,15 @@
+import os
+import sys
+
 import solara
 from mesa.visualization import SolaraViz, make_space_component, make_plot_component
 from mesa.visualization.utils import update_counter
 from matplotlib.figure import Figure
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
 from agents import ParticleAgent, AntAgent
 from model import AntClusteringModel
+from common.dashboard import ProfileGraph, TrajectoryGraph
 
 
 def agent_portrayal(agent):
@@ -58,6 +63,7 @@ def LineGraphWithAverage(model):
     # Render the figure
     solara.FigureMatplotlib(fig)
 
+
 # Model parameters for user adjustment
 model_params = {
     "num_agents": {
@@ -95,7 +101,17 @@ model_params = {
     "central_init": {
         "type": "Checkbox",
         "label": "Central on start on server.txt",
-    }
+    },
+    "profile": {
+        "type": "Checkbox",
+        "value": False,
+        "label": "Profile steps",
+    },
+    "trajectory": {
+        "type": "Checkbox",
+        "value": False,
+        "label": "Record trajectory",
+    },
 }
 
 # Initialize model and visualization components
@@ -109,7 +125,7 @@ SpaceGraph = make_space_component(agent_portrayal)
 # Create the dashboard
 page = SolaraViz(
     initial_model,
-    components=[SpaceGraph, LineGraphWithAverage],
+    components=[SpaceGraph, LineGraphWithAverage, ProfileGraph, TrajectoryGraph],
     model_params=model_params,
     name="Enhanced Ant Clustering Visualization"
 )
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.space import ObjectGrid, ObjectView
+
+
+class ClusteringGrid(ObjectGrid):
+    """ObjectGrid with an occupancy array.
+
+    occupancy[x, y] is the number of agents and objects in a cell, particles[x, y] that
+    of the objects alone. The particles have no fields.
+    """
+
+    def __init__(self, width, height, torus, object_view=None):
+        super().__init__(width, height, torus, object_view=object_view)
+        self.occupancy = np.zeros((width, height), dtype=np.int32)
+        self.particles = np.zeros((width, height), dtype=np.int32)
+
+    def _count(self, agent, pos, delta, obj=None):
+        self.occupancy[pos[0], pos[1]] += delta
+        if obj is not None:
+            self.particles[pos[0], pos[1]] += delta
+        super()._count(agent, pos, delta, obj)
+
+    def is_cell_empty(self, pos):
+        x, y = pos
+        return bool(self.occupancy[x, y] == 0)
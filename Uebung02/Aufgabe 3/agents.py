@@ -1,8 +1,13 @@
+import os
+import sys
+
 from mesa import Agent
 import numpy as np
-import random
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from space import ObjectView, box_sums, shannon_entropy
+from common.streams import spawn_stream
 
-# Constants
+# Constants (RADIUS is the default radius of ClusteringModel, SIGMA_SQUARED its window size)
 PICKUP_THRESHOLD = 0.1
 DROP_THRESHOLD = 0.3
 ALPHA = 0.5
@@ -10,19 +15,27 @@ SIGMA_SQUARED = 25
 RADIUS = int((np.sqrt(SIGMA_SQUARED) - 1) / 2)
 
 
-def _neighbor_entropy(neighbors):
-    """Shannon entropy for neighbor diversity."""
-    object_types = [n.object_type for n in neighbors if isinstance(n, ObjectAgent)]
-    if not object_types:
+def _neighbor_entropy(object_types):
+    """Shannon entropy for neighbor diversity, from the neighbours' object types."""
+    if not len(object_types):
         return 0
     value_counts = np.unique(object_types, return_counts=True)[1]
     probabilities = value_counts / len(object_types)
     return -np.sum(probabilities * np.log2(probabilities))
 
-class ObjectAgent(Agent):
-    def __init__(self, model, object_type):
-        super().__init__(model)
-        self.object_type = object_type
+
+def _neighbor_types(model, pos):
+    """Object types within the model's radius of pos, from the grid's object store."""
+    objects = model.grid.objects
+    return objects.fields["object_type"][objects.gather(model.grid.neighborhood(pos, model.radius))]
+
+class ObjectAgent(ObjectView):
+    """An object: a view of one id of the grid's object store (objects are no Mesa agents)."""
+    __slots__ = ()
+
+    @property
+    def object_type(self):
+        return int(self.model.grid.objects.fields["object_type"][self.unique_id])
 
     def entropy(self, attribute):
         """Calculate entropy for the given attribute."""
@@ -37,8 +50,7 @@ class ObjectAgent(Agent):
         elif attribute == 'particle_carried':
             return 1 if self.carrying else 0
         elif attribute == 'neighbors':
-            neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=RADIUS)
-            return _neighbor_entropy(neighbors)
+            return _neighbor_entropy(_neighbor_types(self.model, self.pos))
 
 
 class AntAgent(Agent):
@@ -46,26 +58,39 @@ class AntAgent(Agent):
         super().__init__(model)
         self.carrying = None
         self.step_size = step_size
+        self.stream = spawn_stream(model.rng)
 
-    def _neighborhood_function(self, neighbors):
-        """Modified neighborhood function f* as per the requirements in the image."""
+    def _neighborhood_function(self, neighbor_types, weight=1):
+        """Modified neighborhood function f* as per the requirements in the image; every
+        neighbour stands for weight cells if the neighbours come from sampled cells."""
         # Calculate the modified similarity measure for each neighbor
         similarities = []
-        for n in neighbors:
-            if isinstance(n, ObjectAgent):
-                if self.carrying:
-                    obj_type = self.carrying.object_type
-                    similarity = 1 - (self._distance(obj_type, n.object_type) / ALPHA)
-                else:
-                    similarity = 1  # Default similarity if no object is under the ant
-                similarities.append(similarity)
-
-        # Return the modified similarity function value
-        if all(similarity > 0 for similarity in similarities):
-            return (1 / SIGMA_SQUARED) * sum(similarities)
+        for object_type in neighbor_types.tolist():
+            if self.carrying:
+                similarity = 1 - (self._distance(self.carrying.object_type, object_type) / ALPHA)
+            else:
+                similarity = 1  # Default similarity if no object is under the ant
+            similarities.append(similarity)
+
+        # Return the modified similarity function value. With sampled cells, whether every
+        # similarity in the window is positive is decided from all of it, not the samples
+        if weight == 1:
+            positive = all(similarity > 0 for similarity in similarities)
+        else:
+            positive = not self.carrying or self._all_similar()
+        if positive:
+            return (weight / self.model.sigma_squared) * sum(similarities)
         else:
             return 0.0
 
+    def _all_similar(self):
+        """Whether every object within the radius has a positive similarity to the carried one,
+        from the grid's per-type window counts (an O(1) lookup)."""
+        if 1 - self._distance(0, 1) / ALPHA > 0:
+            return True
+        counts = self.model.grid.windows.at(self.pos)
+        return counts.sum() == counts[self.carrying.object_type]
+
     @staticmethod
     def _distance(obj1, obj2):
         """Dissimilarity between two object types."""
@@ -82,50 +107,113 @@ class AntAgent(Agent):
         elif attribute == 'particle_carried':
             return 1 if self.carrying else 0
         elif attribute == 'neighbors':
-            neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=RADIUS)
-            return _neighbor_entropy(neighbors)
-
+            return _neighbor_entropy(_neighbor_types(self.model, self.pos))
+
+
+    def _candidate_entropies(self):
+        """Neighbour entropy at every cell within the radius r, read from the grid's type counts.
+
+        Returns the (2r + 1)**2 entropies in get_neighborhood order (the ant's own cell in
+        the middle) and a mask of the cells that are empty.
+        """
+        grid = self.model.grid
+        r = self.model.radius
+        x, y = self.pos
+        # Type counts in a (4r + 1)-wide torus patch, so every window around a candidate fits
+        xs = np.arange(x - 2 * r, x + 2 * r + 1) % grid.width
+        ys = np.arange(y - 2 * r, y + 2 * r + 1) % grid.height
+        patch = grid.type_counts[:, xs[:, None], ys[None, :]]
+
+        # Window counts around every candidate, minus each window's center cell
+        counts = box_sums(patch, r) - patch[:, r:-r, r:-r]
+        entropies = shannon_entropy(counts)
+        empty = grid.occupancy[xs[r:-r, None], ys[None, r:-r]] == 0
+        return entropies.ravel(), empty.ravel()
+
+    def _sampled_candidate_entropies(self, samples):
+        """Estimated neighbour entropy at the ant's cell and at samples random cells within the radius.
+
+        Every window is estimated from the type counts at the same samples random offsets,
+        so the candidates are compared on equal terms. Returns the candidates' x and y (the
+        ant's own cell first), their entropies and a mask of the empty ones.
+        """
+        grid = self.model.grid
+        dx, dy = grid.offsets(self.model.radius)
+        candidates = np.concatenate(([0], self.stream.generator.integers(0, len(dx), samples) + 1))
+        x = (self.pos[0] + np.concatenate(([0], dx))[candidates]) % grid.width
+        y = (self.pos[1] + np.concatenate(([0], dy))[candidates]) % grid.height
+        window = self.stream.generator.integers(0, len(dx), samples)
+        counts = grid.type_counts[:, (x[:, None] + dx[window]) % grid.width, (y[:, None] + dy[window]) % grid.height]
+        return x, y, shannon_entropy(counts.sum(axis=2)), grid.occupancy[x, y] == 0
+
+    def _sampled_move(self, samples):
+        """_move with the candidates and their entropies estimated from samples random cells."""
+        x, y, entropies, empty = self._sampled_candidate_entropies(samples)
+        candidates = np.where(empty, entropies, np.inf)
+        best = int(np.argmin(candidates))
+        if candidates[best] < entropies[0]:
+            self.model.grid.move_agent(self, (int(x[best]), int(y[best])))
+        else:
+            self.model.grid.move_agent(self, self.model._random_empty_cell(self.stream))
 
     def _move(self):
         """Move to the position with the lowest entropy."""
-        neighbors = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False, radius=RADIUS)
-        current_entropy = self.entropy("neighbors")
-        best_position = None
-        lowest_entropy = current_entropy
-
-        for pos in neighbors:
-            if self.model.grid.is_cell_empty(pos):
-                self.model.grid.move_agent(self, pos)
-                entropy = self.entropy("neighbors")
-                self.model.grid.move_agent(self, self.pos)
-                if entropy < lowest_entropy:
-                    best_position, lowest_entropy = pos, entropy
-
-        if best_position:
-            self.model.grid.move_agent(self, best_position)
+        samples = self.model.neighborhood_samples
+        if samples and samples < len(self.model.grid.offsets(self.model.radius)[0]):
+            self._sampled_move(samples)
+            return
+        entropies, empty = self._candidate_entropies()
+        current_entropy = entropies[entropies.size // 2]
+        candidates = np.where(empty, entropies, np.inf)
+        best = int(np.argmin(candidates))  # first of the lowest, as in get_neighborhood order
+
+        if candidates[best] < current_entropy:
+            r = self.model.radius
+            dx, dy = divmod(best, 2 * r + 1)
+            self.model.grid.move_agent(self, (self.pos[0] + dx - r, self.pos[1] + dy - r))
         else:
-            self.model.grid.move_agent(self, self.model._random_empty_cell())
+            self.model.grid.move_agent(self, self.model._random_empty_cell(self.stream))
 
     def step(self):
         """Ant's behavior at each step."""
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=RADIUS)
+        grid = self.model.grid
+        store = grid.objects
+        radius = self.model.radius
+        # Either every cell within radius, or neighborhood_samples random ones, each
+        # standing for weight cells
+        if self.model.neighborhood_samples:
+            cells, weight = grid.sample_neighborhood(self.pos, radius, self.model.neighborhood_samples,
+                                                     self.stream.generator)
+        else:
+            cells, weight = grid.neighborhood(self.pos, radius), 1
+        objects = store.gather(cells)
+        neighbor_types = store.fields["object_type"][objects]
 
         if self.carrying:
-            if self._should_drop(neighbors):
+            if self._should_drop(neighbor_types, weight):
                 self.model.grid.place_agent(self.carrying, self.pos)
                 self.carrying = None
+                self.model.drops += 1
             self._move()
         else:
-            objects = [n for n in neighbors if isinstance(n, ObjectAgent)]
-            if objects and self._should_pick_up(neighbors):
-                self.carrying = random.choice(objects)
+            # Whether there is an object to pick up, and which one, comes from all cells
+            # within radius; the samples only estimate f*
+            if weight == 1:
+                has_objects = len(objects) > 0
+            else:
+                has_objects = grid.windows.at(self.pos).any()
+            if has_objects and self._should_pick_up(neighbor_types, weight):
+                if weight != 1:
+                    objects = store.gather(grid.neighborhood(self.pos, radius))
+                self.carrying = store.view(int(self.stream.choice(objects)))
                 self.model.grid.remove_agent(self.carrying)
+                self.model.pickups += 1
             self._move()
 
-    def _should_pick_up(self, neighbors):
-        similarity = self._neighborhood_function(neighbors)
-        return np.random.rand() < (PICKUP_THRESHOLD / (PICKUP_THRESHOLD + similarity)) ** 2
+    def _should_pick_up(self, neighbor_types, weight=1):
+        similarity = self._neighborhood_function(neighbor_types, weight)
+        return self.stream.random() < (PICKUP_THRESHOLD / (PICKUP_THRESHOLD + similarity)) ** 2
 
-    def _should_drop(self, neighbors):
-        similarity = self._neighborhood_function(neighbors)
-        return np.random.rand() < (similarity / (DROP_THRESHOLD + similarity)) ** 2
\ No newline at end of file
+    def _should_drop(self, neighbor_types, weight=1):
+        similarity = self._neighborhood_function(neighbor_types, weight)
+        return self.stream.random() < (similarity / (DROP_THRESHOLD + similarity)) ** 2
\ No newline at end of file
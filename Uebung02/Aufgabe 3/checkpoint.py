@@ -0,0 +1,107 @@
+"""Checkpoint/restore for ClusteringModel.
+
+The model state is written as compact arrays (positions, object types, carrying links,
+ant ids, free-cell index, schedule order, metric and population baselines, per-ant random
+streams, the model's RNG states, the convergence monitor, step counters and the collected
+series) into one compressed .npz file, and restored into an identical model without
+pickling Mesa agents.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from agents import AntAgent, RADIUS
+from model import ClusteringModel
+from common.checkpoint import (bucket_slots, cell_slots, pack_convergence, pack_random_states,
+                               place_in_bucket_order, place_in_cell_order, restore_ids, unpack_convergence,
+                               unpack_random_states)
+from common.streams import pack_streams, unpack_streams
+
+
+def save(model, path):
+    """Write the state of model to a compressed .npz file at path."""
+    model.flush_metrics()
+    # Objects and ants are numbered together: object ids first, then the ants
+    objects = model.grid.objects
+    ants = [a for a in model.agents if isinstance(a, AntAgent)]
+    index = {ant: len(objects) + i for i, ant in enumerate(ants)}
+
+    arrays = {
+        "width": model.grid.width,
+        "neighborhood_samples": model.neighborhood_samples or 0,
+        "radius": model.radius,
+        "height": model.grid.height,
+        "obj_type": objects.fields["object_type"].astype(np.int32),
+        "ant_carry": np.array([a.carrying.unique_id if a.carrying else -1 for a in ants], dtype=np.int32),
+        "ant_id": np.array([a.unique_id for a in ants], dtype=np.int64),
+        "ant_step_size": np.array([a.step_size for a in ants], dtype=np.int32),
+        "pos": np.concatenate((np.column_stack((objects.x, objects.y)),
+                               np.array([a.pos for a in ants]).reshape(-1, 2))).astype(np.int32),
+        "slot": np.concatenate((bucket_slots(objects), cell_slots(model.grid, ants))),
+        "free_cells": model.grid._free[:model.grid.num_free],
+        # The ants' order, since every step reshuffles the ants from their current order
+        "schedule_order": np.array([index[a] for a in model.schedule.by_type(AntAgent)], dtype=np.int32),
+        "population_baseline_keys": np.array(list(model.population.baselines), dtype=str),
+        "population_baselines": np.array(list(model.population.baselines.values()), dtype=float),
+        "baseline_keys": np.array(["|".join(key) for key in model.metrics.baselines], dtype=str),
+        "steps": model.steps,
+        "schedule_steps": model.schedule.steps,
+        "schedule_time": model.schedule.time,
+        "series_names": np.array(list(model.datacollector.model_vars), dtype=str),
+        "collected_steps": model.series.snapshot().steps,
+    }
+    for i, values in enumerate(model.datacollector.model_vars.values()):
+        arrays[f"series_{i}"] = np.asarray(values)
+    for i, baseline in enumerate(model.metrics.baselines.values()):
+        arrays[f"baseline_{i}"] = baseline
+    arrays.update(pack_streams([a.stream for a in ants]))
+    arrays.update(pack_random_states(model))
+    arrays.update(pack_convergence(model.convergence))
+    np.savez_compressed(path, **arrays)
+
+
+def load(path, **kwargs):
+    """Rebuild the model saved at path; kwargs set the collection options (collect_every, async_metrics)."""
+    with np.load(path, allow_pickle=False) as f:
+        data = dict(f)
+
+    kwargs.setdefault("neighborhood_samples", int(data.get("neighborhood_samples", 0)) or None)
+    kwargs.setdefault("radius", int(data.get("radius", RADIUS)))
+    model = ClusteringModel(int(data["width"]), int(data["height"]), num_agents=0, num_objects=0, **kwargs)
+    objects = model.grid.objects.add(len(data["obj_type"]), object_type=data["obj_type"])
+    n = len(objects)
+    ants = [AntAgent(model, step_size=s) for s in data["ant_step_size"].tolist()]
+    if "ant_id" in data:
+        restore_ids(model, ants, data["ant_id"].tolist())
+    # Carrying first, so the population histograms count the ants in the right bin
+    for ant, carried in zip(ants, data["ant_carry"].tolist()):
+        ant.carrying = model.grid.objects.view(carried) if carried >= 0 else None
+    place_in_bucket_order(model.grid, objects, data["pos"][:n], data["slot"][:n])
+    place_in_cell_order(model.grid, ants, data["pos"][n:], data["slot"][n:])
+    model.num_agents = len(ants)
+    # The order of the free-cell index decides which cell random_empty_cell draws
+    free = data["free_cells"]
+    model.grid._free[:len(free)] = free
+    model.grid._free_slot[:] = -1
+    model.grid._free_slot[free] = np.arange(len(free))
+    for i in data["schedule_order"].tolist():
+        if i >= n:
+            model.schedule.add(ants[i - n])
+    model.metrics.baselines = {tuple(key.split("|")): data[f"baseline_{i}"]
+                               for i, key in enumerate(data["baseline_keys"].tolist())}
+    model.population.baselines = dict(zip(data["population_baseline_keys"].tolist(),
+                                          data["population_baselines"].tolist()))
+
+    model.steps = int(data["steps"])
+    model.schedule.steps = int(data["schedule_steps"])
+    model.schedule.time = data["schedule_time"].item()
+    for i, name in enumerate(data["series_names"].tolist()):
+        model.datacollector.model_vars[name] = data[f"series_{i}"].tolist()
+    model.series.extend(data["collected_steps"], model.datacollector.model_vars)
+
+    unpack_random_states(model, data)
+    unpack_convergence(model, data)
+    unpack_streams([a.stream for a in ants], data)
+    return model
@@ -0,0 +1,98 @@
+"""Population entropy and emergence from incrementally kept histograms.
+
+The population is summarised by histograms of discretised attributes: the x and y
+positions of ants and objects, whether ants carry an object, and the types of
+neighbouring object pairs. They are updated from the grid's place and remove events
+in O(1) per event (O(radius^2) for objects), so the Shannon entropy of every histogram,
+and the emergence as the drop of entropy since a baseline, costs O(bins) at any step
+whatever the number of agents.
+"""
+import numpy as np
+
+from space import shannon_entropy
+
+HISTOGRAMS = ("Ant_X", "Ant_Y", "Ant_Carrying", "OBJ_X", "OBJ_Y", "OBJ_Neighbors")
+COLUMNS = tuple(f"Population_{kind}_{name}" for kind in ("Entropy", "Emergence") for name in HISTOGRAMS)
+
+
+class PopulationHistograms:
+    """Histograms of the agents on a ClusteringGrid, kept up to date as a grid observer.
+
+    Positions fall into `bins` equal bins per axis (one per column/row by default).
+    OBJ_Neighbors counts ordered (type, type) pairs of objects within `radius` of each
+    other. An ant's carrying state is read when it is placed; ants move right after
+    every pick-up and drop, so the histogram is current at the end of each step.
+    """
+
+    def __init__(self, grid, radius, bins=None, num_types=3):
+        self.grid = grid
+        self.radius = radius
+        self.bins = bins
+        self.num_types = num_types
+        x_bins = bins or grid.width
+        y_bins = bins or grid.height
+        self.counts = {
+            "Ant_X": np.zeros(x_bins, dtype=np.int64),
+            "Ant_Y": np.zeros(y_bins, dtype=np.int64),
+            "Ant_Carrying": np.zeros(2, dtype=np.int64),
+            "OBJ_X": np.zeros(x_bins, dtype=np.int64),
+            "OBJ_Y": np.zeros(y_bins, dtype=np.int64),
+            "OBJ_Neighbors": np.zeros(num_types * num_types, dtype=np.int64),
+        }
+        self.baselines = {}  # histogram name -> entropy at the baseline step
+        self._carrying_bin = {}  # ant -> carrying bin it is counted in
+        grid.observers.append(self.update)
+
+    def _bin(self, coord, size):
+        return coord if self.bins is None else coord * self.bins // size
+
+    def _window(self, x, y):
+        """Objects of each type within radius of (x, y), center included (torus)."""
+        xs = np.arange(x - self.radius, x + self.radius + 1) % self.grid.width
+        ys = np.arange(y - self.radius, y + self.radius + 1) % self.grid.height
+        return self.grid.type_counts[:, xs[:, None], ys[None, :]].sum(axis=(1, 2))
+
+    def update(self, agent, pos, delta, object_type=None):
+        """Count (delta=1) or uncount (delta=-1) an ant, or an object of object_type, at pos;
+        called after the grid counts changed."""
+        x, y = pos
+        bin_x = self._bin(x, self.grid.width)
+        bin_y = self._bin(y, self.grid.height)
+        if object_type is None:
+            if delta > 0:
+                carrying = self._carrying_bin[agent] = int(agent.carrying is not None)
+            else:
+                carrying = self._carrying_bin.pop(agent)
+            self.counts["Ant_X"][bin_x] += delta
+            self.counts["Ant_Y"][bin_y] += delta
+            self.counts["Ant_Carrying"][carrying] += delta
+            return
+
+        self.counts["OBJ_X"][bin_x] += delta
+        self.counts["OBJ_Y"][bin_y] += delta
+        neighbours = self._window(x, y)
+        if delta > 0:
+            neighbours[object_type] -= 1  # the object itself
+        pairs = self.counts["OBJ_Neighbors"].reshape(self.num_types, self.num_types)
+        pairs[object_type] += delta * neighbours
+        pairs[:, object_type] += delta * neighbours
+
+    def entropy(self, name):
+        """Shannon entropy (bits) of histogram name."""
+        return float(shannon_entropy(self.counts[name]))
+
+    def set_baseline(self):
+        """Store the current entropies as the emergence baseline."""
+        self.baselines = {name: self.entropy(name) for name in HISTOGRAMS}
+
+    def emergence(self, name):
+        """Drop of entropy of histogram name since the baseline (taken now if unset)."""
+        if not self.baselines:
+            self.set_baseline()
+        return self.baselines[name] - self.entropy(name)
+
+    def values(self):
+        """Entropy and emergence of every histogram, keyed by column name."""
+        row = {f"Population_Entropy_{name}": self.entropy(name) for name in HISTOGRAMS}
+        row.update({f"Population_Emergence_{name}": self.emergence(name) for name in HISTOGRAMS})
+        return row
@@ -0,0 +1,211 @@
+"""Replicate ensembles of ClusteringModel, advanced together as arrays.
+
+R independent replicates of the entropy-seeking clustering model are kept as
+struct-of-arrays state with a leading replicate axis: per-type object counts and
+occupancy of every cell (R, ...), ant positions and carried types (R, ants). Each step
+shuffles the ants of every replicate and then advances the i-th ant of all replicates
+at once, so the Python loop runs over the ants of one model and every operation is
+vectorised over the replicates. The agent metrics of all replicates are computed in
+one pass per step, and bands() gives their mean and percentiles per step.
+
+The rules are those of AntAgent.step: pick-up and drop probabilities from the objects
+within radius, then a move to the empty cell with the lowest neighbour entropy within
+radius, or to a random empty cell if none is lower than the current one.
+"""
+import numpy as np
+
+from agents import DROP_THRESHOLD, PICKUP_THRESHOLD, RADIUS
+from metrics import AGENT_COLUMNS, position_entropy
+from space import box_sums, neighbor_counts, shannon_entropy
+
+
+class ClusteringEnsemble:
+    """R replicates of ClusteringModel(width, height, num_agents, num_objects, radius=radius)
+    stepped together."""
+
+    def __init__(self, replicates, width, height, num_agents=20, num_objects=200, num_types=3, seed=None,
+                 radius=RADIUS):
+        if radius < 1:
+            raise ValueError("The radius must be at least 1")
+        if num_objects + num_agents > width * height:
+            raise ValueError(f"Cannot place {num_objects + num_agents} agents on {width * height} cells")
+        self.replicates = replicates
+        self.width, self.height = width, height
+        self.num_agents, self.num_objects = num_agents, num_objects
+        self.radius = radius
+        self.sigma_squared = (2 * radius + 1) ** 2
+        self.rng = np.random.default_rng(seed)
+        self.steps = 0
+
+        # Distinct random cells per replicate: objects first, then ants
+        r = self._rows = np.arange(replicates)
+        cells = np.argsort(self.rng.random((replicates, width * height)), axis=1)[:, :num_objects + num_agents]
+        x, y = np.divmod(cells, height)
+        object_types = self.rng.integers(0, num_types, (replicates, num_objects))
+        self.type_counts = np.zeros((replicates, num_types, width, height), dtype=np.int32)
+        self.type_counts[r[:, None], object_types, x[:, :num_objects], y[:, :num_objects]] = 1
+        self.occupancy = np.zeros((replicates, width, height), dtype=np.int32)
+        self.occupancy[r[:, None], x, y] = 1
+        self.ant_x = x[:, num_objects:].copy()
+        self.ant_y = y[:, num_objects:].copy()
+        self.ant_carry = np.full((replicates, num_agents), -1)  # carried object type, -1 if none
+
+        # Free-cell index per replicate, as in ClusteringGrid: the first num_free[r] entries of
+        # _free[r] are the empty cell ids of replicate r, _free_slot[r] maps a cell id to its entry
+        self._free = np.argsort(self.occupancy.reshape(replicates, -1), axis=1, kind="stable")
+        self._free_slot = np.argsort(self._free, axis=1)
+        self.num_free = (self.occupancy == 0).sum(axis=(1, 2))
+        self._free_slot[self._free_slot >= self.num_free[:, None]] = -1
+
+        self._window = np.arange(-radius, radius + 1)
+        self._patch = np.arange(-2 * radius, 2 * radius + 1)
+        self._baselines = None
+        self.collected_steps = []
+        self.series = {name: [] for name in AGENT_COLUMNS}  # column -> one (R,) array per collected step
+
+    def _cells(self, x, y, offsets):
+        """Torus coordinates of the square around (x, y) per replicate, as (R, k, 1) and (R, 1, k)."""
+        return (x[:, None] + offsets)[:, :, None] % self.width, (y[:, None] + offsets)[:, None, :] % self.height
+
+    def _random_empty_cells(self, rows):
+        """A uniformly random empty cell for each replicate in rows, from the free-cell index."""
+        num_free = self.num_free[rows]
+        if not num_free.all():
+            raise ValueError("No empty cells left on the grid")
+        cells = self._free[rows, (self.rng.random(len(rows)) * num_free).astype(np.int64)]
+        return np.divmod(cells, self.height)
+
+    def _occupy(self, rows, x, y, delta):
+        """Add delta to the occupancy of cell (x[i], y[i]) of replicate rows[i] and update the
+        free-cell index; rows must be distinct."""
+        self.occupancy[rows, x, y] += delta
+        cells = x * self.height + y
+        if delta > 0:
+            # Swap-remove the cells that just filled up
+            filled = self.occupancy[rows, x, y] == 1
+            rows, cells = rows[filled], cells[filled]
+            slot = self._free_slot[rows, cells]
+            last = self._free[rows, self.num_free[rows] - 1]
+            self._free[rows, slot] = last
+            self._free_slot[rows, last] = slot
+            self._free_slot[rows, cells] = -1
+            self.num_free[rows] -= 1
+        else:
+            emptied = self.occupancy[rows, x, y] == 0
+            rows, cells = rows[emptied], cells[emptied]
+            self._free[rows, self.num_free[rows]] = cells
+            self._free_slot[rows, cells] = self.num_free[rows]
+            self.num_free[rows] += 1
+
+    def _step_ants(self, ants):
+        """Step ant ants[r] of every replicate r."""
+        r = self._rows
+        x, y = self.ant_x[r, ants], self.ant_y[r, ants]
+        carry = self.ant_carry[r, ants]
+
+        # Objects within the radius, without the ant's own cell
+        wx, wy = self._cells(x, y, self._window)
+        window = self.type_counts[r[:, None, None, None], np.arange(self.type_counts.shape[1])[None, :, None, None],
+                                  wx[:, None], wy[:, None]]
+        window[:, :, self.radius, self.radius] = 0
+        counts = window.sum(axis=(2, 3))
+        n = counts.sum(axis=1)
+
+        # f* is n / sigma^2 for pick-ups; for drops only if every neighbour has the carried type
+        carrying = carry >= 0
+        same = counts[r, np.maximum(carry, 0)]
+        f_drop = np.where(same == n, n, 0) / self.sigma_squared
+        f_pick = n / self.sigma_squared
+        u = self.rng.random((2, self.replicates))
+        drop = carrying & (u[0] < (f_drop / (DROP_THRESHOLD + f_drop)) ** 2)
+        pick = ~carrying & (n > 0) & (u[0] < (PICKUP_THRESHOLD / (PICKUP_THRESHOLD + f_pick)) ** 2)
+
+        d = drop.nonzero()[0]
+        self.type_counts[d, carry[d], x[d], y[d]] += 1
+        self._occupy(d, x[d], y[d], 1)
+        self.ant_carry[d, ants[d]] = -1
+
+        p = pick.nonzero()[0]
+        if len(p):
+            # A uniformly chosen neighbouring object, removed from the grid
+            per_cell = window[p].sum(axis=1).reshape(len(p), -1)
+            chosen = (np.floor(u[1, p] * n[p])[:, None] < per_cell.cumsum(axis=1)).argmax(axis=1)
+            dx, dy = np.divmod(chosen, 2 * self.radius + 1)
+            object_type = window[p, :, dx, dy].argmax(axis=1)
+            px, py = wx[p, dx, 0], wy[p, 0, dy]
+            self.type_counts[p, object_type, px, py] -= 1
+            self._occupy(p, px, py, -1)
+            self.ant_carry[p, ants[p]] = object_type
+
+        self._move(ants, x, y)
+
+    def _move(self, ants, x, y):
+        """Move to the empty cell with the lowest neighbour entropy, or to a random empty cell."""
+        r = self._rows
+        px, py = self._cells(x, y, self._patch)
+        patch = self.type_counts[r[:, None, None, None], np.arange(self.type_counts.shape[1])[None, :, None, None],
+                                 px[:, None], py[:, None]]
+        radius = self.radius
+        inner = slice(radius, -radius)
+        counts = box_sums(patch, radius) - patch[:, :, inner, inner]
+        entropies = shannon_entropy(np.moveaxis(counts, 1, 0)).reshape(self.replicates, -1)
+        empty = (self.occupancy[r[:, None, None], px[:, inner], py[:, :, inner]] == 0).reshape(self.replicates, -1)
+
+        candidates = np.where(empty, entropies, np.inf)
+        best = candidates.argmin(axis=1)  # first of the lowest, as in AntAgent._move
+        better = candidates[r, best] < entropies[:, entropies.shape[1] // 2]
+        dx, dy = np.divmod(best, 2 * radius + 1)
+        new_x = (x + dx - radius) % self.width
+        new_y = (y + dy - radius) % self.height
+        relocate = (~better).nonzero()[0]
+        new_x[relocate], new_y[relocate] = self._random_empty_cells(relocate)
+
+        self._occupy(r, x, y, -1)
+        self._occupy(r, new_x, new_y, 1)
+        self.ant_x[r, ants], self.ant_y[r, ants] = new_x, new_y
+
+    def compute(self):
+        """The agent columns of every replicate, as (R,) arrays, in one vectorised pass."""
+        ant_x = position_entropy(self.ant_x).mean(axis=1)
+        ant_y = position_entropy(self.ant_y).mean(axis=1)
+        ant_carrying = (self.ant_carry >= 0).mean(axis=1)
+        current = {"Ant_Emergence_X": ant_x, "Ant_Emergence_Y": ant_y, "Ant_Emergence_Particle": ant_carrying}
+        if self._baselines is None:
+            self._baselines = {name: values.copy() for name, values in current.items()}
+
+        # Carried objects are off the grid and count as entropy 0, as in MetricsEngine
+        objects = self.type_counts.sum(axis=1)
+        num_objects = max(self.num_objects, 1)
+        field = shannon_entropy(np.moveaxis(neighbor_counts(self.type_counts, self.radius), 1, 0))
+        row = {name: self._baselines[name] - values for name, values in current.items()}
+        row.update({
+            "Ant_Average_Entropy_X": ant_x,
+            "Ant_Average_Entropy_Y": ant_y,
+            "Ant_Average_Entropy_Particle": ant_carrying,
+            "OBJ_Average_Entropy_X": objects.sum(axis=2) @ position_entropy(np.arange(self.width)) / num_objects,
+            "OBJ_Average_Entropy_Y": objects.sum(axis=1) @ position_entropy(np.arange(self.height)) / num_objects,
+            "OBJ_Average_Entropy_Neighbors": (field * objects).sum(axis=(1, 2)) / num_objects,
+        })
+        return row
+
+    def collect(self):
+        row = self.compute()
+        for name in AGENT_COLUMNS:
+            self.series[name].append(row[name])
+        self.collected_steps.append(self.steps)
+
+    def step(self):
+        """Advance every replicate by one step (collecting the metrics first, like the model)."""
+        self.collect()
+        order = np.argsort(self.rng.random((self.replicates, self.num_agents)), axis=1)
+        for i in range(self.num_agents):
+            self._step_ants(order[:, i])
+        self.steps += 1
+
+    def bands(self, column, percentiles=(5, 50, 95)):
+        """Mean and percentiles of a column across replicates, per collected step."""
+        values = np.array(self.series[column]).reshape(len(self.collected_steps), self.replicates)
+        bands = {"steps": np.array(self.collected_steps), "mean": values.mean(axis=1)}
+        for q, band in zip(percentiles, np.percentile(values, percentiles, axis=1)):
+            bands[q] = band
+        return bands
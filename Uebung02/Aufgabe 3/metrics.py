@@ -0,0 +1,145 @@
+"""Single-pass metrics for ClusteringModel.
+
+All reporter columns are computed together, once per step, from position, type and
+carrying arrays instead of nine reporters each filtering all agents and calling
+agent.entropy() per agent. Every (attribute, agent type) pair keeps its own emergence
+baseline, taken the first time the metrics are computed. The Population_* columns come
+from the incrementally kept histograms in emergence.py.
+
+The columns are computed from a compact snapshot of the model, so BackgroundMetrics can
+run them on a worker thread while the simulation carries on.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agents import AntAgent, RADIUS
+from emergence import COLUMNS as POPULATION_COLUMNS
+from space import neighbor_counts, shannon_entropy
+
+AGENT_COLUMNS = (
+    "Ant_Emergence_X",
+    "Ant_Emergence_Y",
+    "Ant_Emergence_Particle",
+    "Ant_Average_Entropy_X",
+    "Ant_Average_Entropy_Y",
+    "Ant_Average_Entropy_Particle",
+    "OBJ_Average_Entropy_X",
+    "OBJ_Average_Entropy_Y",
+    "OBJ_Average_Entropy_Neighbors",
+)
+COLUMNS = AGENT_COLUMNS + POPULATION_COLUMNS
+
+
+def position_entropy(coords):
+    """Per-agent entropy -p * log2(p) with p = 1 / (coord + 0.01), as in Agent.entropy."""
+    p = 1 / (np.asarray(coords, dtype=float) + 0.01)
+    return -p * np.log2(p)
+
+
+def neighbor_entropy_field(type_counts, radius=RADIUS):
+    """Shannon entropy of the object types within radius of every cell, center excluded.
+
+    One box filter over the per-type occupancy planes of the whole torus instead of
+    a neighbour query per object.
+    """
+    return shannon_entropy(neighbor_counts(type_counts, radius))
+
+
+def snapshot(model):
+    """Copy of the model state the metrics are computed from, as plain arrays."""
+    ants = list(model.schedule.by_type(AntAgent))
+    objects = model.grid.objects
+    return {
+        "ant_pos": np.array([a.pos for a in ants], dtype=np.int64).reshape(-1, 2),
+        "ant_carrying": np.array([a.carrying is not None for a in ants], dtype=float),
+        "obj_pos": np.column_stack((objects.x, objects.y)).astype(np.int64),
+        "type_counts": model.grid.type_counts.copy(),
+        "population": model.population.values(),  # O(bins), cheap enough for the simulation thread
+    }
+
+
+def _mean(values):
+    return float(np.mean(values)) if len(values) else 0
+
+
+class MetricsEngine:
+    """Computes all reporter columns of a ClusteringModel in one pass per step."""
+
+    def __init__(self, radius=RADIUS):
+        self.radius = radius  # of the neighbour entropy
+        self.baselines = {}  # (attribute, agent type name) -> start entropy of every agent
+        self._changes = None  # grid.changes when _values was computed
+        self._values = None
+
+    def values(self, model):
+        """Reporter values for the model's current state, computed again only after the grid changed."""
+        if self._changes != model.grid.changes:
+            self._values = self.compute(snapshot(model))
+            self._changes = model.grid.changes
+        return self._values
+
+    def emergence(self, key, current):
+        """Mean drop of entropy since the baseline of key (0 when the baseline is taken)."""
+        baseline = self.baselines.get(key)
+        if baseline is None:
+            self.baselines[key] = current.copy()
+            return 0
+        n = min(len(baseline), len(current))
+        return _mean(baseline[:n] - current[:n])
+
+    def compute(self, state):
+        """Compute every column from a snapshot of the model state."""
+        ant_pos, ant_carrying, obj_pos = state["ant_pos"], state["ant_carrying"], state["obj_pos"]
+        placed = obj_pos[:, 0] >= 0
+
+        ant_x = position_entropy(ant_pos[:, 0])
+        ant_y = position_entropy(ant_pos[:, 1])
+        # Carried objects are off the grid and count as entropy 0
+        obj_x, obj_y, obj_neighbors = np.zeros((3, len(obj_pos)))
+        obj_x[placed] = position_entropy(obj_pos[placed, 0])
+        obj_y[placed] = position_entropy(obj_pos[placed, 1])
+        field = neighbor_entropy_field(state["type_counts"], self.radius)
+        obj_neighbors[placed] = field[obj_pos[placed, 0], obj_pos[placed, 1]]
+
+        row = {
+            "Ant_Emergence_X": self.emergence(("x_position", "AntAgent"), ant_x),
+            "Ant_Emergence_Y": self.emergence(("y_position", "AntAgent"), ant_y),
+            "Ant_Emergence_Particle": self.emergence(("particle_carried", "AntAgent"), ant_carrying),
+            "Ant_Average_Entropy_X": _mean(ant_x),
+            "Ant_Average_Entropy_Y": _mean(ant_y),
+            "Ant_Average_Entropy_Particle": _mean(ant_carrying),
+            "OBJ_Average_Entropy_X": _mean(obj_x),
+            "OBJ_Average_Entropy_Y": _mean(obj_y),
+            "OBJ_Average_Entropy_Neighbors": _mean(obj_neighbors),
+        }
+        row.update(state["population"])
+        return row
+
+
+class BackgroundMetrics:
+    """Computes the columns of model snapshots on a single worker thread.
+
+    Snapshots are taken on the simulation thread and processed one at a time in the
+    order they were submitted, so the emergence baselines see the steps in order.
+    merge() appends the finished rows to the model's series in step order.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metrics")
+        self._pending = deque()  # (completed steps, future), oldest first
+
+    def submit(self, model, step):
+        """Queue the metrics of the current model state, recorded as step."""
+        self._pending.append((step, self._executor.submit(self.engine.compute, snapshot(model))))
+
+    def merge(self, model, wait=False):
+        """Append the rows that are done (all of them if wait) to the model's series."""
+        while self._pending and (wait or self._pending[0][1].done()):
+            step, future = self._pending.popleft()
+            model.record(step, future.result())
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -1,101 +1,149 @@
+import os
+import sys
+from functools import partial
+
 import numpy as np
-import random
 from mesa import Model
-from mesa.space import MultiGrid
-from mesa.time import RandomActivation
 from mesa.datacollection import DataCollector
-from agents import AntAgent, ObjectAgent
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from agents import AntAgent, ObjectAgent, RADIUS
+from space import ClusteringGrid
+from schedule import TypedActivation
+from emergence import PopulationHistograms
+from common.convergence import ConvergenceMonitor, same_type_fraction
+from metrics import COLUMNS, BackgroundMetrics, MetricsEngine
+from series import SeriesStore
+from common.profiling import StepProfiler
+from common.trajectory import TrajectoryRecorder
 
 class ClusteringModel(Model):
-    def __init__(self, width, height, num_agents=20, num_objects=200):
-        super().__init__()
-        self.grid = MultiGrid(width, height, torus=True)
-        self.schedule = RandomActivation(self)
+    def __init__(self, width, height, num_agents=20, num_objects=200,
+                 convergence_window=None, convergence_tolerance=0.05,
+                 collect_every=1, async_metrics=False, neighborhood_samples=None, seed=None, profile=False,
+                 trajectory=None, radius=RADIUS):
+        super().__init__(rng=seed)
+        # The ants score the objects within radius, a window of sigma_squared cells
+        if radius < 1:
+            raise ValueError("The radius must be at least 1")
+        self.radius = radius
+        self.sigma_squared = (2 * radius + 1) ** 2
+        self.pickups = 0
+        self.drops = 0
+        self.num_agents = num_agents
+        # With neighborhood_samples, the ants estimate f* and the neighbour entropies of
+        # their moves from that many random cells of each window instead of all of them,
+        # at a cost independent of the radius (see common.space.sampling_error)
+        self.neighborhood_samples = neighborhood_samples
+        self.convergence = None
+        if convergence_window:
+            self.convergence = ConvergenceMonitor(convergence_window, convergence_tolerance)
+        # Sampled neighbourhoods decide the f* gate from per-type window counts, kept in O(1)
+        self.grid = ClusteringGrid(width, height, torus=True, object_view=partial(ObjectAgent, self),
+                                   window_radius=radius if neighborhood_samples else None)
+        self.population = PopulationHistograms(self.grid, radius)  # population entropy, kept incrementally
+        self.schedule = TypedActivation(self, active_types=[AntAgent])
         self._initialize_grid(num_objects, num_agents)
-        self.start_entropies = {}  # Store initial entropies for all agents
 
-        # Data Collection for each attribute
+        # Data Collection for each attribute; the reporters all read one metrics pass per step.
+        # Rows are taken every collect_every steps and go to the DataCollector and to the
+        # columnar series store read by the dashboard, together with the number of
+        # completed steps of each row. With async_metrics the rows are computed from
+        # snapshots on a worker thread and merged into both as they finish.
+        self.metrics = MetricsEngine(radius)
         self.datacollector = DataCollector(
-            model_reporters={
-                "Ant_Emergence_X": lambda m: m.calculate_emergence('x_position', AntAgent),
-                "Ant_Emergence_Y": lambda m: m.calculate_emergence('y_position', AntAgent),
-                "Ant_Emergence_Particle": lambda m: m.calculate_emergence('particle_carried', AntAgent),
-                "Ant_Average_Entropy_X": lambda m: m.average_entropy('x_position', AntAgent),
-                "Ant_Average_Entropy_Y": lambda m: m.average_entropy('y_position', AntAgent),
-                "Ant_Average_Entropy_Particle": lambda m: m.average_entropy('particle_carried', AntAgent),
-
-                "OBJ_Average_Entropy_X": lambda m: m.average_entropy('x_position', ObjectAgent),
-                "OBJ_Average_Entropy_Y": lambda m: m.average_entropy('y_position', ObjectAgent),
-                "OBJ_Average_Entropy_Neighbors": lambda m: m.average_entropy('neighbors', ObjectAgent),
-            }
+            model_reporters={name: (lambda m, name=name: m.metrics.values(m)[name]) for name in COLUMNS}
         )
+        self.collect_every = collect_every
+        self.series = SeriesStore(COLUMNS)
+        self.background_metrics = BackgroundMetrics(self.metrics) if async_metrics else None
 
-    def _initialize_grid(self, num_objects, num_agents):
-        """Place objects and agents on the grid."""
-        for _ in range(num_objects):
-            object_type = random.randint(0, 2)
-            x, y = self._random_empty_cell()
-            obj = ObjectAgent(self, object_type)
-            self.grid.place_agent(obj, (x, y))
-            self.schedule.add(obj)  # Add to scheduler
-
-
-        for _ in range(num_agents):
-                x, y = self._random_empty_cell()
-                ant = AntAgent(self)
-                self.grid.place_agent(ant, (x, y))
-                self.schedule.add(ant)
-
-    def _random_empty_cell(self):
-        """Find a random empty cell."""
-        while True:
-            x, y = random.randrange(self.grid.width), random.randrange(self.grid.height)
-            if self.grid.is_cell_empty((x, y)):
-                return x, y
-
-    def calculate_emergence(self, attribute, type_filter):
-        """Calculate emergence for a specific attribute, optionally filtered by agent type."""
-        # Get the current entropy values as a flat dictionary
-        current_entropies = self.calculate_attribute_entropy(attribute, type_filter)
+        self.profiler = None
+        if profile:
+            self.enable_profiling()
 
-        if not self.start_entropies:
-            # Initialize start_entropies if not done already
-            self.start_entropies = current_entropies
-            return 0
+        self.recorder = None
+        if trajectory:
+            self.enable_trajectory(None if trajectory is True else trajectory)
 
-        # Calculate emergence as the difference between start on server.txt and current entropies
-        emergence_values = [
-            self.start_entropies[agent] - current_entropy
-            for agent, current_entropy in current_entropies.items()
-            if agent in self.start_entropies
-        ]
-        return np.mean(emergence_values) if emergence_values else 0
-
-
-    def calculate_attribute_entropy(self, attribute, type_filter):
-        """Compute entropy for each agent for a specific attribute, optionally filtered by agent type."""
-        # Filter agents based on the type_filter parameter
-
-        agents = [
-            agent for agent in self.schedule.agents
-            if isinstance(agent, type_filter)
-        ]
-        # Return a flat dictionary: {agent: entropy_value}
-        return {agent: agent.entropy(attribute) for agent in agents}
-
-
-    def average_entropy(self, attribute, type_filter):
-        """Compute average entropy for a specific attribute, optionally filtered by agent type."""
-        # Filter agents based on the type_filter parameter
-        agents = [
-            agent for agent in self.schedule.agents
-            if isinstance(agent, type_filter)
-        ]
-        # Calculate the entropy
-        entropies = [agent.entropy(attribute) for agent in agents]
-        return np.mean(entropies) if entropies else 0
+    def _initialize_grid(self, num_objects, num_agents):
+        """Place objects and agents on distinct random cells, all drawn at once."""
+        num_cells = self.grid.width * self.grid.height
+        if num_objects + num_agents > num_cells:
+            raise ValueError(f"Cannot place {num_objects + num_agents} agents on {num_cells} cells")
+        cells = self.rng.choice(num_cells, num_objects + num_agents, replace=False)
+        positions = np.column_stack(np.divmod(cells, self.grid.height))
+
+        # Objects are ids in the grid's object store, not agents
+        objects = self.grid.objects.add(num_objects, object_type=self.rng.integers(0, 3, num_objects))
+        self.grid.place_objects(objects, positions[:num_objects])
+        ants = [AntAgent(self) for _ in range(num_agents)]
+        self.grid.place_agents(ants, positions[num_objects:])
+        for ant in ants:
+            self.schedule.add(ant)  # Add to scheduler
+
+    def _random_empty_cell(self, stream):
+        """Find a random empty cell, drawn from the given random stream."""
+        return self.grid.random_empty_cell(stream)
+
+    def enable_profiling(self):
+        """Time the phases of every step and count the hot-path operations; returns the profiler."""
+        profiler = self.profiler = StepProfiler()
+        profiler.instrument(self.grid.objects, "gather", "neighbours", counter="neighbour_queries")
+        profiler.instrument(self.grid, "place_agent", "grid_mutation")
+        profiler.instrument(self.grid, "remove_agent", "grid_mutation")
+        profiler.instrument(self, "_random_empty_cell", counter="random_relocations")
+        profiler.instrument(self, "collect", "collect")
+        for ant in self.schedule.by_type(AntAgent):
+            profiler.instrument(ant, "_should_pick_up", "probabilities")
+            profiler.instrument(ant, "_should_drop", "probabilities")
+            profiler.instrument(ant, "_move", "move")
+            # Candidate cells whose entropy a move compared (all within the radius, or the samples)
+            profiler.instrument(ant, "_candidate_entropies", counter="cells_probed",
+                                per_call=lambda result: len(result[0]))
+            profiler.instrument(ant, "_sampled_candidate_entropies", counter="cells_probed",
+                                per_call=lambda result: len(result[0]))
+        profiler.instrument_step(self)
+        return profiler
+
+    def enable_trajectory(self, path=None, keyframe_interval=100):
+        """Record the current state and that after every step to path; returns the recorder."""
+        self.recorder = TrajectoryRecorder(self, path, keyframe_interval)
+        return self.recorder
+
+    def clustering_quality(self):
+        """Share of same-type pairs among neighbouring objects on the grid."""
+        return same_type_fraction(self.grid.type_counts)
+
+    def collect(self):
+        """Record the metrics of the current state (Mesa counts self.steps before step runs)."""
+        completed = self.steps - 1
+        if self.background_metrics is not None:
+            self.background_metrics.merge(self)
+        if completed % self.collect_every:
+            return
+        if self.background_metrics is not None:
+            self.background_metrics.submit(self, completed)
+        else:
+            self.datacollector.collect(self)
+            self.series.append(completed, self.metrics.values(self))
+
+    def record(self, step, row):
+        """Append a row of reporter values computed in the background, taken after step completed steps."""
+        for name in COLUMNS:
+            self.datacollector.model_vars[name].append(row[name])
+        self.series.append(step, row)
+
+    def flush_metrics(self):
+        """Wait for the metrics still computing in the background and merge them."""
+        if self.background_metrics is not None:
+            self.background_metrics.merge(self, wait=True)
 
     def step(self):
         """Advance the model by one step."""
-        self.datacollector.collect(self)
-        self.schedule.step()
\ No newline at end of file
+        self.collect()
+        self.pickups = self.drops = 0
+        self.schedule.step()
+        if self.recorder is not None:
+            self.recorder.record()
+        if self.convergence is not None:
+            self.convergence.update(self, self.pickups, self.drops, self.num_agents, self.clustering_quality)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""Headless runs of ClusteringModel for batch jobs.
+
+Only the model code is imported (no Solara, mesa.visualization or Matplotlib). The
+reporter rows are streamed to a CSV file in chunks, and the model keeps only the
+most recent rows in memory, so long runs have bounded memory.
+
+    python run.py --steps 100000 --agents 100 --objects 250 --output run.csv
+
+With --replicates R, R replicates run together as a ClusteringEnsemble and the CSV
+holds the mean and the 5th/50th/95th percentiles of every agent column per step; the
+options of single runs (metrics, convergence, profiling, trajectory, chunking) are rejected.
+With --trajectory DIR the states of the run are recorded for common.trajectory.Trajectory.
+--radius sets the ants' neighbourhood radius; with --neighborhood-samples K they estimate
+each neighbourhood from K random cells, at a per-ant cost independent of the radius.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from agents import RADIUS
+from ensemble import ClusteringEnsemble
+from metrics import AGENT_COLUMNS
+from model import ClusteringModel
+
+SINGLE_RUN_OPTIONS = ("--collect-every", "--async-metrics", "--convergence-window", "--convergence-tolerance",
+                      "--chunk", "--profile", "--keep", "--trajectory", "--keyframe-interval",
+                      "--neighborhood-samples")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run ClusteringModel without the dashboard.")
+    parser.add_argument("--width", type=int, default=50)
+    parser.add_argument("--height", type=int, default=50)
+    parser.add_argument("--agents", type=int, default=100, help="number of ants")
+    parser.add_argument("--objects", type=int, default=250, help="number of objects")
+    parser.add_argument("--steps", type=int, default=1000, help="steps to run (fewer if the run converges)")
+    parser.add_argument("--collect-every", type=int, default=1, help="steps between reporter rows")
+    parser.add_argument("--async-metrics", action="store_true", help="compute the rows on a worker thread")
+    parser.add_argument("--replicates", type=int, default=1, help="run an ensemble of this many replicates")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the model's random streams")
+    parser.add_argument("--radius", type=int, default=RADIUS, help="radius of the ants' neighbourhood")
+    parser.add_argument("--neighborhood-samples", type=int, default=None,
+                        help="estimate the neighbourhoods from this many random cells")
+    parser.add_argument("--convergence-window", type=int, default=None, help="stop once the run has settled")
+    parser.add_argument("--convergence-tolerance", type=float, default=0.05)
+    parser.add_argument("--output", default="series.csv", help="CSV file for the reporter rows")
+    parser.add_argument("--chunk", type=int, default=1000, help="rows written per chunk")
+    parser.add_argument("--profile", default=None, help="JSON file for per-phase step timings")
+    parser.add_argument("--keep", type=int, default=1000, help="most recent rows kept in memory")
+    parser.add_argument("--trajectory", default=None, help="directory to record the trajectory to")
+    parser.add_argument("--keyframe-interval", type=int, default=100, help="frames between trajectory keyframes")
+    args = parser.parse_args(argv)
+    if args.replicates > 1:
+        # The ensemble only writes the bands of the agent columns per step
+        dests = {option: option[2:].replace("-", "_") for option in SINGLE_RUN_OPTIONS}
+        ignored = [option for option, dest in dests.items() if getattr(args, dest) != parser.get_default(dest)]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} only apply to single runs, not to --replicates > 1")
+    return args
+
+
+def write_rows(model, out, written):
+    """Append the rows after the first `written` rows still held by the model; returns the new count."""
+    snapshot = model.series.snapshot()
+    first = written - (model.series.total - snapshot.length)  # index of the first unwritten row
+    if first >= snapshot.length:
+        return written
+    rows = np.column_stack([snapshot.steps[first:]] + [snapshot.columns[name][first:] for name in model.series.columns])
+    np.savetxt(out, rows, delimiter=",", fmt=["%d"] + ["%.10g"] * len(model.series.columns))
+    return model.series.total
+
+
+def trim(model, keep):
+    """Keep only the last `keep` collected rows in the DataCollector and the series store."""
+    for values in model.datacollector.model_vars.values():
+        del values[:-keep or len(values)]
+    model.series.keep_last(keep)
+
+
+def run_ensemble(args):
+    """Run the replicates together and write their bands per step."""
+    ensemble = ClusteringEnsemble(args.replicates, args.width, args.height, num_agents=args.agents,
+                                  num_objects=args.objects, seed=args.seed, radius=args.radius)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        ensemble.step()
+    elapsed = time.perf_counter() - start
+
+    percentiles = (5, 50, 95)
+    bands = [ensemble.bands(name, percentiles) for name in AGENT_COLUMNS]
+    stats = ("mean",) + percentiles
+    header = ["step"] + [f"{name}_{stat if stat == 'mean' else f'p{stat}'}" for name in AGENT_COLUMNS for stat in stats]
+    rows = np.column_stack([bands[0]["steps"]] + [band[stat] for band in bands for stat in stats])
+    np.savetxt(args.output, rows, delimiter=",", header=",".join(header), comments="",
+               fmt=["%d"] + ["%.10g"] * (rows.shape[1] - 1))
+    print(f"{args.replicates} replicates x {args.steps} steps in {elapsed:.1f} s, "
+          f"{len(rows)} rows written to {args.output}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.replicates > 1:
+        return run_ensemble(args)
+    model = ClusteringModel(args.width, args.height, num_agents=args.agents, num_objects=args.objects,
+                            convergence_window=args.convergence_window,
+                            convergence_tolerance=args.convergence_tolerance,
+                            collect_every=args.collect_every, async_metrics=args.async_metrics,
+                            neighborhood_samples=args.neighborhood_samples,
+                            seed=args.seed, profile=args.profile is not None, radius=args.radius)
+    if args.trajectory is not None:
+        model.enable_trajectory(args.trajectory, args.keyframe_interval)
+
+    start = time.perf_counter()
+    written = 0
+    with open(args.output, "w") as out:
+        out.write(",".join(("step",) + model.series.columns) + "\n")
+        while model.running and model.steps < args.steps:
+            model.step()
+            if model.series.total - written >= args.chunk:
+                written = write_rows(model, out, written)
+                trim(model, args.keep)
+        model.flush_metrics()
+        written = write_rows(model, out, written)
+        trim(model, args.keep)
+    elapsed = time.perf_counter() - start
+
+    print(f"{model.steps} steps in {elapsed:.1f} s ({model.steps / elapsed:.1f} steps/s), "
+          f"{written} rows written to {args.output}")
+    if model.recorder is not None:
+        model.recorder.close()
+        print(f"{model.recorder.frames} frames recorded to {args.trajectory}")
+    if model.profiler is not None:
+        model.profiler.dump(args.profile)
+        phases = model.profiler.summary()["seconds_per_step"]
+        print("ms per step: " + ", ".join(f"{phase} {1000 * t:.2f}" for phase, t in sorted(phases.items())))
+    if model.convergence is not None and model.convergence.stop_step is not None:
+        print(f"Stopped at step {model.convergence.stop_step}: {model.convergence.stop_reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+import numpy as np
+
+Snapshot = namedtuple("Snapshot", ["length", "steps", "columns"])
+
+
+class SeriesStore:
+    """Reporter rows kept as preallocated NumPy columns that grow by doubling.
+
+    Appending a row is amortised O(1). snapshot() returns views of the filled part
+    and is memoised on the number of rows, so every dashboard component of a frame
+    reads the same arrays instead of building its own DataFrame.
+    """
+
+    def __init__(self, columns, capacity=1024):
+        self.columns = tuple(columns)
+        self._steps = np.empty(capacity, dtype=np.int64)
+        self._data = np.empty((len(self.columns), capacity))
+        self.length = 0
+        self.total = 0  # rows ever appended, including the ones dropped by keep_last
+        self._snapshot = None
+
+    def __len__(self):
+        return self.length
+
+    def _reserve(self, length):
+        capacity = self._steps.size
+        if length <= capacity:
+            return
+        while capacity < length:
+            capacity *= 2
+        steps = np.empty(capacity, dtype=np.int64)
+        steps[:self.length] = self._steps[:self.length]
+        data = np.empty((len(self.columns), capacity))
+        data[:, :self.length] = self._data[:, :self.length]
+        self._steps, self._data = steps, data
+
+    def append(self, step, row):
+        """Append the values of row (a dict with every column) recorded at step."""
+        self._reserve(self.length + 1)
+        self._steps[self.length] = step
+        self._data[:, self.length] = [row[name] for name in self.columns]
+        self.length += 1
+        self.total += 1
+
+    def extend(self, steps, columns):
+        """Append many rows at once from a steps array and a dict of column arrays."""
+        n = len(steps)
+        self._reserve(self.length + n)
+        self._steps[self.length:self.length + n] = steps
+        for i, name in enumerate(self.columns):
+            self._data[i, self.length:self.length + n] = columns[name]
+        self.length += n
+        self.total += n
+
+    def keep_last(self, n):
+        """Drop all but the last n rows, to bound the memory of long runs."""
+        if self.length <= n:
+            return
+        start = self.length - n
+        self._steps[:n] = self._steps[start:self.length]
+        self._data[:, :n] = self._data[:, start:self.length]
+        self.length = n
+        self._snapshot = None
+
+    def snapshot(self):
+        """Views of the filled rows: Snapshot(length, steps, {column: values})."""
+        if self._snapshot is None or self._snapshot.length != self.length:
+            steps = self._steps[:self.length]
+            data = self._data[:, :self.length]
+            self._snapshot = Snapshot(self.length, steps,
+                                      {name: data[i] for i, name in enumerate(self.columns)})
+        return self._snapshot
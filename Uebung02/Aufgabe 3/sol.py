@@ -1,8 +1,13 @@
+import os
+import sys
+
 from matplotlib.figure import Figure
 from mesa.visualization.utils import update_counter
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
 from model import ClusteringModel
 from mesa.visualization import SolaraViz, make_space_component
 from agents import AntAgent
+from common.dashboard import ProfileGraph, TrajectoryGraph
 import solara
 
 # Model parameters
@@ -20,112 +25,72 @@ def agent_portrayal(agent):
         return {"size": size * 1.5 if agent.carrying else size, "color": color}
     return {"size": size, "color": colors.get(agent.object_type, "gray")}
 
-@solara.component
-def AntEmergenceGraph(model):
-    """Line graph visualization for Ant Emergence."""
-    update_counter.get()
-
-    fig = Figure()
-    ax = fig.subplots()
-
-    df = model.datacollector.get_model_vars_dataframe()
-
-    if not df.empty:
-        steps = df.index
-        ax.plot(steps, df["Ant_Emergence_X"], label="Ant Emergence (X)", color="blue", linewidth=1.5)
-        ax.plot(steps, df["Ant_Emergence_Y"], label="Ant Emergence (Y)", color="green", linewidth=1.5)
-        ax.plot(steps, df["Ant_Emergence_Particle"], label="Ant Emergence (Particle)", color="red", linewidth=1.5)
-
-        ax.set_title("Ant Emergence Over Time", fontsize=14)
-        ax.set_xlabel("Steps", fontsize=12)
-        ax.set_ylabel("Emergence", fontsize=12)
-        ax.legend(loc="upper right", fontsize=10)
-        ax.grid(alpha=0.5)
-    else:
-        ax.text(0.5, 0.5, "No data available yet", ha='center', va='center', fontsize=14)
-        ax.axis('off')
-
-    solara.FigureMatplotlib(fig)
-
-@solara.component
-def AntObjectEmergenceParticleGraph(model):
-    """Line graph visualization for Ant Emergence."""
-    update_counter.get()
-
-    fig = Figure()
-    ax = fig.subplots()
-
-    df = model.datacollector.get_model_vars_dataframe()
-
-    if not df.empty:
-        steps = df.index
-        ax.plot(steps, df["OBJ_Average_Entropy_Neighbors"], label="Object Entropy (Neighbors)", color="brown", linewidth=1.5)
-        ax.plot(steps, df["Ant_Average_Entropy_Particle"], label="Ant Entropy (Particle)", color="red", linewidth=1.5)
-
-        ax.set_title("Ant & Object Entropy (Particle) Over Time", fontsize=14)
-        ax.set_xlabel("Steps", fontsize=12)
-        ax.set_ylabel("Emergence", fontsize=12)
-        ax.legend(loc="upper right", fontsize=10)
-        ax.grid(alpha=0.5)
-    else:
-        ax.text(0.5, 0.5, "No data available yet", ha='center', va='center', fontsize=14)
-        ax.axis('off')
-
-    solara.FigureMatplotlib(fig)
-
+# Longest line drawn per series; longer series are thinned with a fixed stride
+MAX_POINTS = 2000
 
-@solara.component
-def AntEntropyGraph(model):
-    """Line graph visualization for Ant Average Entropy."""
-    update_counter.get()
 
+def _series_figure(title, ylabel, lines):
+    """Figure with one empty line per (column, label, color), created once per model."""
     fig = Figure()
     ax = fig.subplots()
-
-    df = model.datacollector.get_model_vars_dataframe()
-
-    if not df.empty:
-        steps = df.index
-        ax.plot(steps, df["Ant_Average_Entropy_X"], label="Ant Entropy (X)", color="blue", linewidth=1.5)
-        ax.plot(steps, df["Ant_Average_Entropy_Y"], label="Ant Entropy (Y)", color="green", linewidth=1.5)
-
-        ax.set_title("Ant Average Entropy Over Time", fontsize=14)
-        ax.set_xlabel("Steps", fontsize=12)
-        ax.set_ylabel("Entropy", fontsize=12)
-        ax.legend(loc="upper right", fontsize=10)
-        ax.grid(alpha=0.5)
-    else:
-        ax.text(0.5, 0.5, "No data available yet", ha='center', va='center', fontsize=14)
-        ax.axis('off')
-
-    solara.FigureMatplotlib(fig)
-
-
-@solara.component
-def ObjectEntropyGraph(model):
-    """Line graph visualization for Object Average Entropy."""
-    update_counter.get()
-
-    fig = Figure()
-    ax = fig.subplots()
-
-    df = model.datacollector.get_model_vars_dataframe()
-
-    if not df.empty:
-        steps = df.index
-        ax.plot(steps, df["OBJ_Average_Entropy_X"], label="Object Entropy (X)", color="orange", linewidth=1.5)
-        ax.plot(steps, df["OBJ_Average_Entropy_Y"], label="Object Entropy (Y)", color="purple", linewidth=1.5)
-
-        ax.set_title("Object Average Entropy Over Time", fontsize=14)
-        ax.set_xlabel("Steps", fontsize=12)
-        ax.set_ylabel("Entropy", fontsize=12)
-        ax.legend(loc="upper right", fontsize=10)
-        ax.grid(alpha=0.5)
-    else:
-        ax.text(0.5, 0.5, "No data available yet", ha='center', va='center', fontsize=14)
-        ax.axis('off')
-
-    solara.FigureMatplotlib(fig)
+    artists = [ax.plot([], [], label=label, color=color, linewidth=1.5)[0] for _, label, color in lines]
+    ax.set_title(title, fontsize=14)
+    ax.set_xlabel("Steps", fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+    ax.legend(loc="upper right", fontsize=10)
+    ax.grid(alpha=0.5)
+    placeholder = ax.text(0.5, 0.5, "No data available yet", ha='center', va='center', fontsize=14,
+                          transform=ax.transAxes)
+    return fig, ax, artists, placeholder
+
+
+def make_series_graph(title, ylabel, lines):
+    """Line graph component for some reporter columns.
+
+    All graphs read the model's shared, step-memoised series snapshot and update the
+    data of persistent lines, instead of building a DataFrame and a new figure per tick.
+    """
+
+    @solara.component
+    def SeriesGraph(model):
+        update_counter.get()
+        fig, ax, artists, placeholder = solara.use_memo(
+            lambda: _series_figure(title, ylabel, lines), dependencies=[model]
+        )
+
+        snapshot = model.series.snapshot()
+        stride = max(1, -(-snapshot.length // MAX_POINTS))
+        for (column, _, _), line in zip(lines, artists):
+            line.set_data(snapshot.steps[::stride], snapshot.columns[column][::stride])
+        placeholder.set_visible(snapshot.length == 0)
+        ax.relim()
+        ax.autoscale_view()
+
+        solara.FigureMatplotlib(fig, dependencies=[model, snapshot.length])
+
+    return SeriesGraph
+
+
+AntEmergenceGraph = make_series_graph("Ant Emergence Over Time", "Emergence", [
+    ("Ant_Emergence_X", "Ant Emergence (X)", "blue"),
+    ("Ant_Emergence_Y", "Ant Emergence (Y)", "green"),
+    ("Ant_Emergence_Particle", "Ant Emergence (Particle)", "red"),
+])
+
+AntObjectEmergenceParticleGraph = make_series_graph("Ant & Object Entropy (Particle) Over Time", "Emergence", [
+    ("OBJ_Average_Entropy_Neighbors", "Object Entropy (Neighbors)", "brown"),
+    ("Ant_Average_Entropy_Particle", "Ant Entropy (Particle)", "red"),
+])
+
+AntEntropyGraph = make_series_graph("Ant Average Entropy Over Time", "Entropy", [
+    ("Ant_Average_Entropy_X", "Ant Entropy (X)", "blue"),
+    ("Ant_Average_Entropy_Y", "Ant Entropy (Y)", "green"),
+])
+
+ObjectEntropyGraph = make_series_graph("Object Average Entropy Over Time", "Entropy", [
+    ("OBJ_Average_Entropy_X", "Object Entropy (X)", "orange"),
+    ("OBJ_Average_Entropy_Y", "Object Entropy (Y)", "purple"),
+])
 
 
 # Model parameters as sliders for user interactivity
@@ -148,25 +113,43 @@ model_params = {
         "max": 2500,
         "step": 10,
     },
+    "profile": {
+        "type": "Checkbox",
+        "value": False,
+        "label": "Profile steps",
+    },
+    "trajectory": {
+        "type": "Checkbox",
+        "value": False,
+        "label": "Record trajectory",
+    },
 }
 
-# Initialize the model
-initial_model = ClusteringModel(
-    width=GRID_SIZE,
-    height=GRID_SIZE,
-    num_agents=NUM_AGENTS,
-    num_objects=NUM_OBJECTS
-)
-
 # Create a space visualization component
 SpaceGraph = make_space_component(agent_portrayal)
 
-# Create the Solara page for visualization with separate graphs
-page = SolaraViz(
-    initial_model,
-    components=[SpaceGraph, AntEmergenceGraph, AntEntropyGraph, ObjectEntropyGraph, AntObjectEmergenceParticleGraph],
-    model_params=model_params,
-    name="Ant Clustering Visualization with Separate Graphs"
-)
 
-page
\ No newline at end of file
+@solara.component
+def Page():
+    """Dashboard page; the model is built on first render instead of at import time."""
+    initial_model = solara.use_memo(
+        lambda: ClusteringModel(
+            width=GRID_SIZE,
+            height=GRID_SIZE,
+            num_agents=NUM_AGENTS,
+            num_objects=NUM_OBJECTS
+        ),
+        dependencies=[],
+    )
+
+    # Create the Solara page for visualization with separate graphs
+    SolaraViz(
+        initial_model,
+        components=[SpaceGraph, AntEmergenceGraph, AntEntropyGraph, ObjectEntropyGraph, AntObjectEmergenceParticleGraph,
+                    ProfileGraph, TrajectoryGraph],
+        model_params=model_params,
+        name="Ant Clustering Visualization with Separate Graphs"
+    )
+
+
+Page
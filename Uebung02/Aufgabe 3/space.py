@@ -0,0 +1,117 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.space import ObjectGrid, ObjectView, WindowCounts
+
+
+def box_sums(counts, radius):
+    """Sums over every (2r + 1) x (2r + 1) window of the last two axes, via cumulative sums.
+
+    Only windows that fit completely are returned, so the result is 2r smaller than
+    counts along both axes.
+    """
+    size = 2 * radius + 1
+    summed = np.pad(counts.cumsum(axis=-2).cumsum(axis=-1), [(0, 0)] * (counts.ndim - 2) + [(1, 0), (1, 0)])
+    return (summed[..., size:, size:] - summed[..., :-size, size:]
+            - summed[..., size:, :-size] + summed[..., :-size, :-size])
+
+
+def shannon_entropy(counts):
+    """Shannon entropy in bits of the histograms along axis 0 (0 for empty histograms)."""
+    totals = counts.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probabilities = counts / totals
+        return -np.sum(np.where(counts > 0, probabilities * np.log2(probabilities), 0), axis=0)
+
+
+def neighbor_counts(type_counts, radius):
+    """Per-type object counts within radius of every cell (Moore, torus), center excluded.
+
+    The grid is given by the last two axes of type_counts; leading axes (types,
+    replicates) are kept.
+    """
+    padded = np.pad(type_counts, [(0, 0)] * (type_counts.ndim - 2) + [(radius, radius)] * 2, mode="wrap")
+    return box_sums(padded, radius) - type_counts
+
+
+class ClusteringGrid(ObjectGrid):
+    """ObjectGrid with per-cell count fields and typed objects.
+
+    occupancy[x, y] is the number of agents and objects in a cell and type_counts[t, x, y] the
+    number of objects of type t, kept up to date on every place, move and remove so
+    that neighbourhoods can be scored from arrays instead of agent lists.
+
+    The empty cells are kept in a free-cell index: the first num_free entries of
+    _free hold their cell ids (x * height + y) and _free_slot maps a cell id to its
+    entry (-1 if occupied). Cells are swap-removed when they fill up, so sampling a
+    uniformly random empty cell is O(1).
+
+    changes counts the count changes so far, so caches of derived values can tell
+    whether the grid changed since they were filled.
+
+    With window_radius, windows is a WindowCounts of the objects within that radius of
+    every cell, so window counts are O(1) lookups (None otherwise).
+
+    Callables in observers are called as observer(agent, pos, delta, object_type) after
+    every count change, to keep derived statistics up to date; for objects agent is
+    None and object_type is set, for agents object_type is None.
+    """
+
+    def __init__(self, width, height, torus, num_types=3, object_view=None, window_radius=None):
+        super().__init__(width, height, torus, fields={"object_type": np.int16}, object_view=object_view)
+        self.windows = None
+        if window_radius is not None:
+            self.windows = WindowCounts(self, window_radius, num_types)
+        self.occupancy = np.zeros((width, height), dtype=np.int32)
+        self.type_counts = np.zeros((num_types, width, height), dtype=np.int32)
+        self._free = np.arange(width * height)
+        self._free_slot = np.arange(width * height)
+        self.num_free = width * height
+        self.changes = 0
+
+    def _count(self, agent, pos, delta, obj=None):
+        """Count agent, or object id obj, in (delta=1) or out of (delta=-1) pos."""
+        x, y = pos
+        self.changes += 1
+        self.occupancy[x, y] += delta
+        object_type = None
+        if obj is not None:
+            object_type = int(self.objects.fields["object_type"][obj])
+            self.type_counts[object_type, x, y] += delta
+            if self.windows is not None:
+                self.windows.add(object_type, pos, delta)
+
+        if delta > 0 and self.occupancy[x, y] == 1:
+            # Swap-remove the cell from the free-cell index
+            cell = x * self.height + y
+            slot = self._free_slot[cell]
+            last = self._free[self.num_free - 1]
+            self._free[slot] = last
+            self._free_slot[last] = slot
+            self._free_slot[cell] = -1
+            self.num_free -= 1
+        elif delta < 0 and self.occupancy[x, y] == 0:
+            cell = x * self.height + y
+            self._free[self.num_free] = cell
+            self._free_slot[cell] = self.num_free
+            self.num_free += 1
+
+        for observer in self.observers:
+            observer(agent, pos, delta, object_type)
+
+    def neighbor_counts(self, radius):
+        """Per-type object counts within radius of every cell (Moore, torus), center excluded."""
+        return neighbor_counts(self.type_counts, radius)
+
+    def is_cell_empty(self, pos):
+        x, y = pos
+        return bool(self.occupancy[x, y] == 0)
+
+    def random_empty_cell(self, stream):
+        """A uniformly random empty cell drawn from stream (a common.streams.RandomStream), in O(1)."""
+        if self.num_free == 0:
+            raise ValueError("No empty cells left on the grid")
+        return divmod(int(self._free[stream.randint(0, self.num_free - 1)]), self.height)
@@ -0,0 +1,243 @@
+"""Benchmark harness for the clustering models of Uebung01 and Uebung02.
+
+Every scenario (model, grid size, ants, objects, metrics on/off, backend) runs headless
+in its own subprocess, because the exercise directories share module names (model,
+agents, space, ...) and so that peak RSS is measured per scenario. Each run records
+steps per second, peak RSS and the time spent in metric collection.
+
+    python benchmark.py --output results.json --plot curves/     # scaling curves
+    python benchmark.py --save-baseline baseline.json            # store a baseline
+    python benchmark.py --baseline baseline.json --threshold 0.1  # regression gate
+
+With --baseline, the exit status is 1 if a scenario got slower than the baseline by
+more than --threshold (relative steps/s) or used more than --rss-threshold more memory.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# How to build each model and where its metric collection happens: "hook" is the
+# method that collects (timed, or replaced by a no-op when metrics are off), "call" a
+# model method the harness calls after every step when metrics are on.
+MODELS = {
+    "u01a1": {
+        "dir": os.path.join("Uebung01", "Aufgabe1"),
+        "build": lambda model, s: model.AntClusteringModel(
+            num_agents=s["ants"], particle_density=s["objects"] / 2500, seed=s["seed"]),
+        "hook": ("datacollector", "collect"),
+        "fixed_grid": 50,
+    },
+    "u01a2": {
+        "dir": os.path.join("Uebung01", "Aufgabe 2"),
+        "build": lambda model, s: model.ClusteringModel(
+            s["grid"], s["grid"], num_agents=s["ants"], num_objects=s["objects"], backend=s["backend"],
+            seed=s["seed"]),
+        "call": "clustering_quality",
+        "backends": ("mesa", "kernel"),
+    },
+    "u02": {
+        "dir": os.path.join("Uebung02", "Aufgabe 3"),
+        "build": lambda model, s: model.ClusteringModel(
+            s["grid"], s["grid"], num_agents=s["ants"], num_objects=s["objects"], seed=s["seed"]),
+        "hook": (None, "collect"),
+    },
+}
+
+DEFAULTS = {"grid": 50, "ants": 50, "objects": 250, "metrics": True, "backend": "mesa", "seed": 1}
+SWEEPS = {"grid": [30, 50, 100], "ants": [20, 50, 100, 200], "objects": [100, 250, 500, 1000]}
+
+
+def scenario_key(s):
+    return f"{s['model']}|grid={s['grid']}|ants={s['ants']}|objects={s['objects']}|" \
+           f"metrics={int(s['metrics'])}|backend={s['backend']}"
+
+
+def scenarios(models, sweeps=SWEEPS):
+    """The default suite: every sweep around DEFAULTS, with metrics on and off, per model.
+
+    A scenario on several sweeps (e.g. the defaults themselves) is run once and lists
+    all of them in "sweeps".
+    """
+    seen = {}
+    for name in models:
+        spec = MODELS[name]
+        for variable, values in sweeps.items():
+            if variable == "grid" and "fixed_grid" in spec:
+                continue
+            for value in values:
+                for metrics in (True, False):
+                    for backend in spec.get("backends", ("mesa",)):
+                        s = dict(DEFAULTS, model=name, metrics=metrics, backend=backend, sweeps=[variable])
+                        s[variable] = value
+                        if "fixed_grid" in spec:
+                            s["grid"] = spec["fixed_grid"]
+                        if s["ants"] + s["objects"] > s["grid"] ** 2:
+                            continue
+                        s = seen.setdefault(scenario_key(s), s)
+                        if variable not in s["sweeps"]:
+                            s["sweeps"].append(variable)
+    return list(seen.values())
+
+
+def run_scenario(s, steps, warmup):
+    """Build and run one scenario in this process; returns its measurements."""
+    spec = MODELS[s["model"]]
+    sys.path.insert(0, os.path.join(ROOT, spec["dir"]))
+    import warnings
+    warnings.simplefilter("ignore")
+    import model
+
+    start = time.perf_counter()
+    m = spec["build"](model, s)
+    build_seconds = time.perf_counter() - start
+
+    metric_seconds = [0.0]
+    if "hook" in spec:
+        attr, name = spec["hook"]
+        owner = getattr(m, attr) if attr else m
+        collect = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            t = time.perf_counter()
+            result = collect(*args, **kwargs)
+            metric_seconds[0] += time.perf_counter() - t
+            return result
+
+        setattr(owner, name, timed if s["metrics"] else (lambda *args, **kwargs: None))
+    call = getattr(m, spec["call"]) if s["metrics"] and "call" in spec else None
+
+    def advance(n):
+        for _ in range(n):
+            m.step()
+            if call is not None:
+                t = time.perf_counter()
+                call()
+                metric_seconds[0] += time.perf_counter() - t
+
+    advance(warmup)
+    metric_seconds[0] = 0.0
+    start = time.perf_counter()
+    advance(steps)
+    seconds = time.perf_counter() - start
+
+    return {
+        "steps_per_s": steps / seconds,
+        "ms_per_step": 1000 * seconds / steps,
+        "metric_ms_per_step": 1000 * metric_seconds[0] / steps,
+        "build_s": build_seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_isolated(s, steps, warmup):
+    """Run a scenario in a fresh interpreter and return its measurements."""
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(s),
+                           "--steps", str(steps), "--warmup", str(warmup)],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{scenario_key(s)} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold, rss_threshold):
+    """Regressions of results against baseline, as printable lines."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        speed = result["steps_per_s"] / base["steps_per_s"] - 1
+        memory = result["peak_rss_mb"] / base["peak_rss_mb"] - 1
+        if speed < -threshold:
+            regressions.append(f"{key}: {base['steps_per_s']:.1f} -> {result['steps_per_s']:.1f} steps/s "
+                               f"({100 * speed:+.1f}%)")
+        if memory > rss_threshold:
+            regressions.append(f"{key}: {base['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB peak RSS "
+                               f"({100 * memory:+.1f}%)")
+    return regressions
+
+
+def plot_curves(results, directory):
+    """One PNG per model and sweep: steps/s against the swept variable, metrics on and off."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    os.makedirs(directory, exist_ok=True)
+    groups = {}
+    for result in results.values():
+        s = result["scenario"]
+        for variable in s["sweeps"]:
+            groups.setdefault((s["model"], variable), []).append(result)
+    for (name, variable), group in groups.items():
+        fig = Figure()
+        ax = fig.subplots()
+        lines = {}
+        for result in group:
+            s = result["scenario"]
+            label = f"metrics {'on' if s['metrics'] else 'off'}" + (f", {s['backend']}" if s["backend"] != "mesa" else "")
+            lines.setdefault(label, []).append((s[variable], result["steps_per_s"]))
+        for label, points in sorted(lines.items()):
+            xs, ys = zip(*sorted(points))
+            ax.plot(xs, ys, marker="o", label=label)
+        ax.set_title(f"{name}: steps/s by {variable}")
+        ax.set_xlabel(variable)
+        ax.set_ylabel("steps/s")
+        ax.set_yscale("log")
+        ax.legend()
+        ax.grid(alpha=0.5)
+        fig.savefig(os.path.join(directory, f"{name}_{variable}.png"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the clustering models.")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--steps", type=int, default=100, help="timed steps per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed steps first (JIT, caches)")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--plot", default=None, help="directory for the scaling curves")
+    parser.add_argument("--save-baseline", default=None, help="store the results as a baseline")
+    parser.add_argument("--baseline", default=None, help="compare against this baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative steps/s drop")
+    parser.add_argument("--rss-threshold", type=float, default=0.2, help="allowed relative peak RSS growth")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        print(json.dumps(run_scenario(json.loads(args.child), args.steps, args.warmup)))
+        return 0
+
+    results = {}
+    for s in scenarios(args.models):
+        key = scenario_key(s)
+        result = run_isolated(s, args.steps, args.warmup)
+        result["scenario"] = s
+        results[key] = result
+        print(f"{key}: {result['steps_per_s']:.1f} steps/s, metrics {result['metric_ms_per_step']:.2f} ms/step, "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB", flush=True)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=1)
+    if args.plot:
+        plot_curves(results, args.plot)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.rss_threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Code shared by the clustering models of Uebung01 and Uebung02.
+
+The exercise directories put the repository root on sys.path and import these
+modules as common.<module>.
+"""
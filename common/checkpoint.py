@@ -0,0 +1,101 @@
+"""Helpers shared by the checkpoint modules of the clustering models.
+
+Cell and bucket orders are saved as slots (the index of an agent or object in its
+cell list) and restored by placing in slot order. The states of the model's
+random.Random and Generator and of its ConvergenceMonitor are packed into plain
+arrays, so a checkpoint loads with allow_pickle=False. The global random and
+np.random modules are not the model's and are left alone.
+"""
+import itertools
+import json
+
+import numpy as np
+from mesa import Agent
+
+from common.convergence import ConvergenceMonitor
+
+
+def _pack_random(state):
+    """random.Random state as an integer array (the gauss cache is dropped if unset)."""
+    version, internal, gauss = state
+    return np.array(internal, dtype=np.int64), np.array(np.nan if gauss is None else gauss)
+
+
+def _unpack_random(internal, gauss):
+    gauss = float(gauss)
+    return 3, tuple(int(v) for v in internal), None if np.isnan(gauss) else gauss
+
+
+def cell_slots(grid, agents):
+    """Index of each agent in its cell list (-1 if off the grid), to restore the cell order."""
+    return np.array([grid._grid[a.pos[0]][a.pos[1]].index(a) if a.pos else -1 for a in agents], dtype=np.int32)
+
+
+def place_in_cell_order(grid, agents, positions, slots):
+    """Place the agents that have a position so that every cell list keeps its saved order."""
+    order = [i for i in np.argsort(slots, kind="stable").tolist() if slots[i] >= 0]
+    grid.place_agents([agents[i] for i in order], positions[order])
+
+
+def bucket_slots(objects):
+    """Index of each object in its cell bucket (-1 if off the grid), to restore the bucket order."""
+    slots = np.full(len(objects), -1, dtype=np.int32)
+    for bucket in objects.buckets:
+        if bucket:
+            slots[bucket] = np.arange(len(bucket))
+    return slots
+
+
+def place_in_bucket_order(grid, ids, positions, slots):
+    """Place the objects that have a position so that every cell bucket keeps its saved order."""
+    order = [i for i in np.argsort(slots, kind="stable").tolist() if slots[i] >= 0]
+    grid.place_objects(ids[order], positions[order])
+
+
+def restore_ids(model, agents, ids):
+    """Give the agents their saved unique_ids; new agents of model are numbered after them."""
+    for agent, unique_id in zip(agents, ids):
+        agent.unique_id = unique_id
+    Agent._ids[model] = itertools.count(max(ids, default=0) + 1)
+
+
+def pack_random_states(model):
+    """States of model.random and model.rng as checkpoint arrays."""
+    arrays = {}
+    arrays["model_random"], arrays["model_random_gauss"] = _pack_random(model.random.getstate())
+    arrays["model_rng"] = np.array(json.dumps(model.rng.bit_generator.state))
+    return arrays
+
+
+def unpack_random_states(model, data):
+    """Restore the states written by pack_random_states."""
+    model.random.setstate(_unpack_random(data["model_random"], data["model_random_gauss"]))
+    model.rng.bit_generator.state = json.loads(data["model_rng"].item())
+
+
+def pack_convergence(monitor):
+    """Parameters and ring buffers of a ConvergenceMonitor (none if monitor is None) as checkpoint arrays."""
+    if monitor is None:
+        return {}
+    return {"convergence_params": np.array([monitor.window, monitor.tolerance, monitor.atol, monitor.check_every]),
+            "convergence_events": monitor.events,
+            "convergence_qualities": np.array(monitor.qualities, dtype=float),
+            "convergence_steps": monitor.steps,
+            "convergence_stop_step": -1 if monitor.stop_step is None else monitor.stop_step,
+            "convergence_stop_reason": np.array(monitor.stop_reason or "")}
+
+
+def unpack_convergence(model, data):
+    """Restore model.convergence written by pack_convergence (and model.running if it had stopped)."""
+    if "convergence_params" not in data:
+        return
+    window, tolerance, atol, check_every = data["convergence_params"].tolist()
+    monitor = ConvergenceMonitor(int(window), tolerance, atol, int(check_every))
+    monitor.events[:] = data["convergence_events"]
+    monitor.qualities.extend(data["convergence_qualities"].tolist())
+    monitor.steps = int(data["convergence_steps"])
+    stop_step = int(data["convergence_stop_step"])
+    monitor.stop_step = None if stop_step < 0 else stop_step
+    monitor.stop_reason = data["convergence_stop_reason"].item() or None
+    model.convergence = monitor
+    model.running = monitor.stop_step is None
@@ -0,0 +1,70 @@
+"""Convergence detection with early stopping for the clustering models, and the
+clustering quality measures it watches."""
+from collections import deque
+
+import numpy as np
+
+
+def neighbour_density(occupancy):
+    """Average share of occupied cells in the Moore neighbourhoods of occupied cells (torus)."""
+    neighbours = sum(np.roll(occupancy, (dx, dy), axis=(0, 1))
+                     for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+    total = occupancy.sum()
+    return float((occupancy * neighbours).sum() / (8 * total)) if total else 0.0
+
+
+def same_type_fraction(counts):
+    """Share of same-type pairs among neighbouring objects, from (types, width, height) counts (torus)."""
+    neighbours = sum(np.roll(counts, (dx, dy), axis=(1, 2))
+                     for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+    pairs = (counts * neighbours.sum(axis=0)).sum()
+    return float((counts * neighbours).sum() / pairs) if pairs else 0.0
+
+
+class ConvergenceMonitor:
+    """Detects when a clustering run has settled and stops it.
+
+    The pick-ups and drops of the last 2 * window steps are kept in a ring buffer, so
+    the rates (per ant and step) are rolling means over the last window steps and the
+    window before it. The clustering quality is sampled every check_every steps (a
+    tenth of the window by default) and compared with the sample about window steps
+    earlier. Once all three change by at most max(tolerance * |previous|, atol),
+    model.running is set to False and the stopping step and reason are recorded.
+    """
+
+    def __init__(self, window=100, tolerance=0.05, atol=1e-3, check_every=None):
+        self.window = window
+        self.tolerance = tolerance
+        self.atol = atol
+        self.check_every = check_every or max(window // 10, 1)
+        self.events = np.zeros((2 * window, 2))  # pick-ups and drops per step, ring buffer
+        self.qualities = deque(maxlen=window // self.check_every + 1)
+        self.steps = 0
+        self.stop_step = None
+        self.stop_reason = None
+
+    def update(self, model, pickups, drops, num_ants, quality):
+        """Account for one step; quality is a callable, evaluated every check_every steps."""
+        self.events[self.steps % len(self.events)] = pickups, drops
+        self.steps += 1
+        if self.steps % self.check_every:
+            return False
+        self.qualities.append(quality())
+        if self.steps < len(self.events):
+            return False
+
+        recent = self.events[np.arange(self.steps - self.window, self.steps) % len(self.events)].sum(axis=0)
+        earlier = self.events.sum(axis=0) - recent
+        samples = max(num_ants, 1) * self.window
+        current = (*recent / samples, self.qualities[-1])
+        previous = (*earlier / samples, self.qualities[0])
+
+        change = np.abs(np.subtract(current, previous))
+        if np.all(change <= np.maximum(self.tolerance * np.abs(previous), self.atol)):
+            self.stop_step = model.steps
+            self.stop_reason = (f"pick-up rate, drop rate and clustering quality changed by at most "
+                                f"{self.tolerance:.0%} (or {self.atol:g}) between the last two windows "
+                                f"of {self.window} steps")
+            model.running = False
+            return True
+        return False
@@ -0,0 +1,69 @@
+"""Solara components shared by the dashboards (sol.py) of the clustering models."""
+import solara
+from matplotlib.figure import Figure
+from mesa.visualization.utils import update_counter
+
+
+@solara.component
+def ProfileGraph(model):
+    """Mean time per phase and hot-path counts of the recent steps (needs "Profile steps")."""
+    update_counter.get()
+
+    fig = Figure()
+    ax = fig.subplots()
+    summary = model.profiler.summary(last=100) if model.profiler is not None else None
+
+    if summary and summary["seconds_per_step"]:
+        phases = sorted(summary["seconds_per_step"].items(), key=lambda item: item[1])
+        ax.barh([phase for phase, _ in phases], [1000 * seconds for _, seconds in phases], color="steelblue")
+        counts = ", ".join(f"{name}: {n:.1f}" for name, n in sorted(summary["counts_per_step"].items()))
+        ax.set_title("Time per Step by Phase (last 100 steps)", fontsize=14)
+        ax.set_xlabel(f"ms per step\n{counts}", fontsize=10)
+        ax.grid(alpha=0.5, axis="x")
+        fig.tight_layout()
+    else:
+        ax.text(0.5, 0.5, "Profiling is off", ha='center', va='center', fontsize=14)
+        ax.axis('off')
+
+    solara.FigureMatplotlib(fig)
+
+
+@solara.component
+def TrajectoryGraph(model):
+    """The recorded state at any earlier step, chosen with a slider (needs "Record trajectory").
+
+    Objects with an object_type field are coloured by type and the ants drawn as outlines;
+    untyped particles are green and the ants blue while carrying, orange otherwise.
+    """
+    update_counter.get()
+    step, set_step = solara.use_state(None)  # None follows the latest recorded step
+
+    fig = Figure()
+    ax = fig.subplots()
+    trajectory = model.recorder.trajectory() if model.recorder is not None else None
+
+    if trajectory is not None and len(trajectory):
+        steps = trajectory.steps
+        shown = int(steps[-1]) if step is None else min(max(step, int(steps[0])), int(steps[-1]))
+        solara.SliderInt("Recorded step", value=shown, min=int(steps[0]), max=int(steps[-1]), on_value=set_step)
+        state = trajectory.state(shown)
+        placed = state["obj_pos"][:, 0] >= 0
+        if "object_type" in trajectory.fields:
+            colors = {0: "green", 1: "red", 2: "purple"}
+            object_types = trajectory.fields["object_type"][placed]
+            ax.scatter(*state["obj_pos"][placed].T, s=10, c=[colors.get(t, "gray") for t in object_types.tolist()])
+            ax.scatter(*state["ant_pos"].T, s=20, marker="^", facecolors="none", edgecolors="black", linewidths=0.5)
+        else:
+            carrying = state["ant_carry"] >= 0
+            ax.scatter(*state["obj_pos"][placed].T, s=10, c="green")
+            ax.scatter(*state["ant_pos"][carrying].T, s=20, marker="^", c="blue")
+            ax.scatter(*state["ant_pos"][~carrying].T, s=20, marker="^", c="orange")
+        ax.set_xlim(-0.5, trajectory.width - 0.5)
+        ax.set_ylim(-0.5, trajectory.height - 0.5)
+        ax.set_aspect("equal")
+        ax.set_title(f"Recorded State at Step {state['step']}", fontsize=14)
+    else:
+        ax.text(0.5, 0.5, "Recording is off", ha='center', va='center', fontsize=14)
+        ax.axis('off')
+
+    solara.FigureMatplotlib(fig)
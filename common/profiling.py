@@ -0,0 +1,111 @@
+"""Opt-in per-phase timers and counters for model steps.
+
+A StepProfiler replaces chosen methods of individual objects (the grid, the ants, the
+model) by timing and counting wrappers. Nothing is wrapped until profiling is enabled,
+so an unprofiled model runs exactly the original code at no cost.
+
+Times are exclusive: while a nested phase runs (e.g. the grid mutation inside a move),
+the enclosing phase's clock is paused, so the phases of a step add up to its total.
+"""
+import json
+from collections import deque
+from time import perf_counter
+
+
+class StepProfiler:
+    """Per-phase times (seconds) and counters, aggregated per step."""
+
+    def __init__(self, history=10_000):
+        self.times = {}  # phase -> seconds in the current step
+        self.counts = {}  # counter -> count in the current step
+        self.history = deque(maxlen=history)  # {"step", "times", "counts"} of the recent steps
+        self.total_times = {}
+        self.total_counts = {}
+        self.steps = 0
+        self._stack = []  # [phase, start of its running interval]
+
+    def _enter(self, phase):
+        now = perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.times[parent[0]] = self.times.get(parent[0], 0.0) + now - parent[1]
+        self._stack.append([phase, now])
+
+    def _exit(self):
+        now = perf_counter()
+        phase, started = self._stack.pop()
+        self.times[phase] = self.times.get(phase, 0.0) + now - started
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def count(self, counter, n=1):
+        self.counts[counter] = self.counts.get(counter, 0) + n
+
+    def instrument(self, obj, name, phase=None, counter=None, per_call=1):
+        """Wrap obj.name so that its calls are timed as phase and/or counted per_call times.
+
+        per_call may also be a function of the call's result, e.g. len to count the cells
+        a neighbourhood query returned.
+        """
+        method = getattr(obj, name)
+
+        def wrapper(*args, **kwargs):
+            if phase is None:
+                result = method(*args, **kwargs)
+            else:
+                self._enter(phase)
+                try:
+                    result = method(*args, **kwargs)
+                finally:
+                    self._exit()
+            if counter is not None:
+                self.count(counter, per_call(result) if callable(per_call) else per_call)
+            return result
+
+        setattr(obj, name, wrapper)
+
+    def instrument_step(self, model):
+        """Time the model's steps (the time outside all other phases is "other") and close
+        every step with its pick-ups and drops."""
+        self.instrument(model, "_user_step", "other")
+        user_step = model._user_step
+
+        def step():
+            user_step()
+            self.end_step(model.steps, pickups=model.pickups, drops=model.drops)
+
+        model._user_step = step
+
+    def end_step(self, step, **counts):
+        """Close the current step, adding counts (e.g. pickups=...) to its counters."""
+        for counter, n in counts.items():
+            self.count(counter, n)
+        self.history.append({"step": step, "times": self.times, "counts": self.counts})
+        for phase, seconds in self.times.items():
+            self.total_times[phase] = self.total_times.get(phase, 0.0) + seconds
+        for counter, n in self.counts.items():
+            self.total_counts[counter] = self.total_counts.get(counter, 0) + n
+        self.steps += 1
+        self.times, self.counts = {}, {}
+
+    def summary(self, last=None):
+        """Mean seconds per phase and mean counts per step, over all or the last `last` steps."""
+        if last is None:
+            steps, times, counts = self.steps, self.total_times, self.total_counts
+        else:
+            records = list(self.history)[-last:]
+            steps, times, counts = len(records), {}, {}
+            for record in records:
+                for phase, seconds in record["times"].items():
+                    times[phase] = times.get(phase, 0.0) + seconds
+                for counter, n in record["counts"].items():
+                    counts[counter] = counts.get(counter, 0) + n
+        steps = max(steps, 1)
+        return {"steps": steps,
+                "seconds_per_step": {phase: t / steps for phase, t in times.items()},
+                "counts_per_step": {counter: n / steps for counter, n in counts.items()}}
+
+    def dump(self, path):
+        """Write the summary and the recent per-step records to a JSON file."""
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "steps": list(self.history)}, f, indent=1)
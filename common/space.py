@@ -0,0 +1,274 @@
+"""Objects as ids in compact arrays, and the MultiGrid the clustering models build on.
+
+The passive objects of the models (particles, typed objects) are no Mesa agents but
+integer ids in an ObjectStore; ObjectView makes an agent-like view of one when needed.
+ObjectGrid keeps such a store next to the Mesa agents, places and removes both, and
+looks up neighbourhoods as flat cell ids from cached offset tables.
+"""
+import numpy as np
+from mesa.agent import AgentSet
+from mesa.space import MultiGrid
+
+TABLE_LIMIT = 1 << 22  # entries of a stored neighbourhood table (int64)
+
+
+def sampling_error(samples, confidence=0.95):
+    """Hoeffding half-width of the mean of samples uniform draws of values in [0, 1].
+
+    With the given confidence, a sum over n neighbourhood cells with per-cell values in
+    [0, m], estimated from samples cells by sample_neighborhood, is off by at most n * m
+    times this.
+    """
+    return np.sqrt(np.log(2 / (1 - confidence)) / (2 * samples))
+
+
+class WindowCounts:
+    """Per-type object counts within a fixed radius of every cell (Moore, torus, center excluded).
+
+    counts[t, x, y] is the number of objects of type t around (x, y). The grid calls add()
+    on every placement and removal of an object, which costs O(radius^2), so that the
+    counts of any window are read in O(1) by at().
+    """
+
+    def __init__(self, grid, radius, num_types):
+        self.grid = grid
+        self.radius = radius
+        self.counts = np.zeros((num_types, grid.width, grid.height), dtype=np.int32)
+
+    def add(self, object_type, pos, delta):
+        """Count an object of object_type in (delta=1) or out of (delta=-1) the windows around pos."""
+        self.counts.reshape(len(self.counts), -1)[object_type, self.grid.neighborhood(pos, self.radius)] += delta
+
+    def at(self, pos):
+        """Object counts per type within radius of pos."""
+        return self.counts[:, pos[0], pos[1]]
+
+
+class ObjectView:
+    """Agent-like view of object unique_id of model.grid.objects.
+
+    Objects are no Mesa agents: views are made on demand (for the dashboard, or when
+    an ant picks an object up) by ObjectStore.view, which keeps one view per id.
+    """
+
+    __slots__ = ("model", "unique_id", "__weakref__")
+
+    def __init__(self, model, unique_id):
+        self.model = model
+        self.unique_id = unique_id
+
+    @property
+    def pos(self):
+        objects = self.model.grid.objects
+        x = objects.x[self.unique_id]
+        return None if x < 0 else (int(x), int(objects.y[self.unique_id]))
+
+
+class ObjectStore:
+    """Passive objects as integer ids in compact arrays.
+
+    Object i is at (x[i], y[i]), or at -1 while an ant carries it, and fields[name][i]
+    holds its attribute `name` (e.g. object_type). buckets[cell] lists the ids in a cell
+    (cell id x * height + y) in placement order, so the objects of a neighbourhood are
+    gathered as one id array.
+    """
+
+    def __init__(self, width, height, fields=None, view=None):
+        self.height = height
+        self.x = np.empty(0, dtype=np.int32)
+        self.y = np.empty(0, dtype=np.int32)
+        self.fields = {name: np.empty(0, dtype=dtype) for name, dtype in (fields or {}).items()}
+        self.buckets = [[] for _ in range(width * height)]
+        self.make_view = view  # id -> ObjectView
+        self.views = {}
+
+    def __len__(self):
+        return len(self.x)
+
+    def add(self, n, **values):
+        """Append n objects, off the grid, with the given field values; returns their ids."""
+        start = len(self.x)
+        self.x = np.concatenate((self.x, np.full(n, -1, dtype=np.int32)))
+        self.y = np.concatenate((self.y, np.full(n, -1, dtype=np.int32)))
+        for name, array in self.fields.items():
+            added = np.broadcast_to(values.get(name, -1), n).astype(array.dtype)
+            self.fields[name] = np.concatenate((array, added))
+        return np.arange(start, start + n)
+
+    def link(self, i, pos):
+        x, y = pos
+        self.x[i], self.y[i] = x, y
+        self.buckets[x * self.height + y].append(i)
+
+    def unlink(self, i):
+        """Take object i off the grid; returns where it was."""
+        x, y = int(self.x[i]), int(self.y[i])
+        self.buckets[x * self.height + y].remove(i)
+        self.x[i] = self.y[i] = -1
+        return x, y
+
+    def placed(self):
+        """Ids of the objects on the grid."""
+        return np.flatnonzero(self.x >= 0)
+
+    def gather(self, cells):
+        """Ids of the objects in cells (flat cell ids), as one int array, in the order of
+        cells and within a cell in placement order (the order of get_neighbors)."""
+        buckets = self.buckets
+        return np.array([i for cell in cells.tolist() for i in buckets[cell]], dtype=np.int64)
+
+    def at(self, pos):
+        """Ids of the objects at pos, in placement order (the bucket itself, not a copy)."""
+        return self.buckets[pos[0] * self.height + pos[1]]
+
+    def view(self, i):
+        """The view of object i, made on first use."""
+        view = self.views.get(i)
+        if view is None:
+            view = self.views[i] = self.make_view(i)
+        return view
+
+
+class ObjectGrid(MultiGrid):
+    """MultiGrid with bulk placement and an object store.
+
+    The objects are ids in the ObjectStore objects (with the given fields), made by
+    object_view(id) into views when needed; place_agent and remove_agent accept such
+    views. Every placement and removal of an agent or object goes through _count, which
+    subclasses extend with their per-cell counts; here it only calls the observers as
+    observer(i, pos, delta) after object i was placed at (delta=1) or removed from
+    (delta=-1) pos.
+    """
+
+    def __init__(self, width, height, torus, fields=None, object_view=None):
+        super().__init__(width, height, torus)
+        self.objects = ObjectStore(width, height, fields=fields, view=object_view)
+        self.observers = []
+        self._neighborhoods = {}  # (radius, moore, include_center) -> table
+        self._offsets = {}  # (radius, moore, include_center) -> (dx, dy)
+
+    def _count(self, agent, pos, delta, obj=None):
+        """Count agent, or object id obj, in (delta=1) or out of (delta=-1) pos."""
+        if obj is not None:
+            for observer in self.observers:
+                observer(obj, pos, delta)
+
+    def offsets(self, radius=1, include_center=False, moore=True):
+        """(dx, dy) of the distinct cells around a cell, in get_neighborhood order."""
+        key = (radius, moore, include_center)
+        offsets = self._offsets.get(key)
+        if offsets is None:
+            d = np.arange(-radius, radius + 1)
+            dx, dy = np.repeat(d, len(d)), np.tile(d, len(d))
+            keep = (dx != 0) | (dy != 0) | include_center
+            if not moore:
+                keep &= np.abs(dx) + np.abs(dy) <= radius
+            dx, dy = dx[keep], dy[keep]
+            if 2 * radius + 1 > min(self.width, self.height):
+                # Offsets that wrap onto the same cell count once, and never onto the
+                # center unless it is included, as in get_neighborhood
+                cells = dx % self.width * self.height + dy % self.height
+                first = np.sort(np.unique(cells, return_index=True)[1])
+                if not include_center:
+                    first = first[cells[first] != 0]
+                dx, dy = dx[first], dy[first]
+            offsets = self._offsets[key] = dx, dy
+        return offsets
+
+    def neighborhood(self, pos, radius=1, include_center=False, moore=True):
+        """Flat cell ids (x * height + y) around pos on the torus, in get_neighborhood order.
+
+        The (dx, dy) offsets are built once per (radius, moore, include_center) and
+        wrapped arithmetically for every cell at once into a (cells, k) table, so a
+        lookup is one row of it. Tables above TABLE_LIMIT entries are not stored; their
+        rows are wrapped per lookup instead.
+        """
+        key = (radius, moore, include_center)
+        table = self._neighborhoods.get(key)
+        if table is None:
+            dx, dy = self.offsets(radius, include_center, moore)
+            if self.width * self.height * len(dx) <= TABLE_LIMIT:
+                x, y = np.divmod(np.arange(self.width * self.height), self.height)
+                table = (x[:, None] + dx) % self.width * self.height + (y[:, None] + dy) % self.height
+            else:
+                table = (dx, dy)
+            self._neighborhoods[key] = table
+        if isinstance(table, tuple):
+            dx, dy = table
+            return (pos[0] + dx) % self.width * self.height + (pos[1] + dy) % self.height
+        return table[pos[0] * self.height + pos[1]]
+
+    def sample_neighborhood(self, pos, radius, samples, rng, include_center=False):
+        """samples cell ids drawn uniformly, with replacement, from neighborhood(pos, radius)
+        with the Generator rng, and the number of neighbourhood cells per sample.
+
+        A sum over the neighbourhood is estimated by the weight times the sum over the
+        samples, at a cost independent of the radius (see sampling_error for its error).
+        Neighbourhoods of at most samples cells are returned whole, with weight 1.
+        """
+        dx, dy = self.offsets(radius, include_center)
+        if len(dx) <= samples:
+            return self.neighborhood(pos, radius, include_center), 1
+        pick = rng.integers(0, len(dx), samples)
+        return (pos[0] + dx[pick]) % self.width * self.height + (pos[1] + dy[pick]) % self.height, len(dx) / samples
+
+    def is_cell_empty(self, pos):
+        x, y = pos
+        return not self._grid[x][y] and not self.objects.at(pos)
+
+    @property
+    def agents(self):
+        """The agents on the grid and views of the objects on it (e.g. for the space drawer)."""
+        agents = super().agents
+        views = [self.objects.view(i) for i in self.objects.placed().tolist()]
+        return AgentSet(list(agents) + views, random=agents.random)
+
+    def place_agent(self, agent, pos):
+        if isinstance(agent, ObjectView):
+            self.place_object(agent.unique_id, self.torus_adj(pos))
+            return
+        super().place_agent(agent, pos)
+        self._count(agent, agent.pos, 1)
+        self._empty_mask[agent.pos] = False  # True for empty cells (MultiGrid sets it the other way)
+
+    def remove_agent(self, agent):
+        if isinstance(agent, ObjectView):
+            self.remove_object(agent.unique_id)
+            return
+        pos = agent.pos
+        self._count(agent, pos, -1)  # first, so is_cell_empty is current inside MultiGrid
+        super().remove_agent(agent)
+        self._empty_mask[pos] = self.is_cell_empty(pos)
+
+    def place_object(self, i, pos):
+        """Place object i at pos (no view needed)."""
+        self.objects.link(i, pos)
+        self._count(None, pos, 1, i)
+        self._empty_mask[pos] = False
+        if self._empties_built:
+            self._empties.discard(pos)
+
+    def remove_object(self, i):
+        """Take object i off the grid."""
+        pos = self.objects.unlink(i)
+        self._count(None, pos, -1, i)
+        empty = self._empty_mask[pos] = self.is_cell_empty(pos)
+        if self._empties_built and empty:
+            self._empties.add(pos)
+
+    def place_objects(self, ids, positions):
+        """Place objects ids at the matching rows of an (n, 2) position array in one pass."""
+        for i, pos in zip(ids.tolist(), positions.tolist()):
+            self.place_object(i, tuple(pos))
+
+    def place_agents(self, agents, positions):
+        """Place agents at the matching rows of an (n, 2) position array in one pass."""
+        cells = self._grid
+        self._empty_mask[positions[:, 0], positions[:, 1]] = False
+        positions = positions.tolist()
+        for agent, (x, y) in zip(agents, positions):
+            cells[x][y].append(agent)
+            agent.pos = (x, y)
+            self._count(agent, (x, y), 1)
+        if self._empties_built:
+            self._empties.difference_update(map(tuple, positions))
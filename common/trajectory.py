@@ -0,0 +1,227 @@
+"""Memory-mapped trajectories of clustering runs, for scrubbing and offline analysis.
+
+A TrajectoryRecorder appends the state of a model after every step to a directory:
+ant positions and carried object ids, and object positions (-1 while carried). Every
+keyframe_interval frames the full state is written as a keyframe; every frame also
+appends the changes since the previous frame as delta events. All files are flat
+arrays of fixed-size records with compact integer dtypes, so a Trajectory reads them
+through np.memmap: any step is rebuilt from the keyframe before it plus at most
+keyframe_interval frames of deltas, and a slice of a long run is loaded without the
+rest of the run. The models record with trajectory=<directory> (True for a temporary
+one) or enable_trajectory(path, keyframe_interval).
+
+    trajectory = Trajectory("run.traj")
+    state = trajectory.state(5000)             # ant_pos, ant_carry, obj_pos at step 5000
+    window = trajectory.slice(10_000, 11_000)  # the same, stacked for 1000 steps
+
+Files: meta.json (sizes, dtypes, interval), static.npz (ant unique_ids and the store's
+object fields), keyframes.bin, deltas.bin and index.bin (step and end of its deltas
+per frame). Deltas and keyframes are written before the index, so a reader running
+alongside the recorder only sees complete frames.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+ANT = 0
+OBJECT = 1
+
+
+def coordinate_dtype(width, height):
+    """Smallest signed dtype holding every coordinate of the grid and -1 (off the grid)."""
+    return np.dtype(np.int16 if max(width, height) <= np.iinfo(np.int16).max else np.int32)
+
+
+def keyframe_dtype(num_ants, num_objects, coords):
+    return np.dtype([("step", "<i8"), ("ant_pos", coords, (num_ants, 2)), ("ant_carry", "<i4", (num_ants,)),
+                     ("obj_pos", coords, (num_objects, 2))])
+
+
+def delta_dtype(coords):
+    """One changed ant (x, y, carried object id) or object (x, y) in a frame."""
+    return np.dtype([("kind", "u1"), ("index", "<u4"), ("x", coords), ("y", coords), ("carry", "<i4")])
+
+
+INDEX_DTYPE = np.dtype([("step", "<i8"), ("end", "<i8")])  # step of a frame, end of its deltas
+
+
+class TrajectoryRecorder:
+    """Appends the states of model to the trajectory directory path (a new temporary one if None)."""
+
+    def __init__(self, model, path=None, keyframe_interval=100):
+        self.model = model
+        self.path = path if path is not None else tempfile.mkdtemp(prefix="trajectory-")
+        os.makedirs(self.path, exist_ok=True)
+        self.keyframe_interval = keyframe_interval
+        self.ants = sorted(model.schedule.agents, key=lambda a: a.unique_id)
+        objects = model.grid.objects
+        self.num_objects = len(objects)
+        self.coords = coordinate_dtype(model.grid.width, model.grid.height)
+        self.keyframe_dtype = keyframe_dtype(len(self.ants), self.num_objects, self.coords)
+        self.delta_dtype = delta_dtype(self.coords)
+
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"width": model.grid.width, "height": model.grid.height, "num_ants": len(self.ants),
+                       "num_objects": self.num_objects, "keyframe_interval": keyframe_interval,
+                       "coords": self.coords.str}, f)
+        np.savez(os.path.join(self.path, "static.npz"), ant_ids=np.array([a.unique_id for a in self.ants]),
+                 **objects.fields)
+        self._files = {name: open(os.path.join(self.path, name + ".bin"), "wb")
+                       for name in ("deltas", "keyframes", "index")}
+        self.frames = 0
+        self.events = 0
+        self._last = None
+        self.record()
+
+    def _state(self):
+        """Current ant positions (-1 if off the grid), carried ids (-1 if none) and object positions."""
+        ant_pos = np.array([a.pos if a.pos is not None else (-1, -1) for a in self.ants],
+                           dtype=self.coords).reshape(-1, 2)
+        ant_carry = np.array([a.carrying.unique_id if a.carrying else -1 for a in self.ants], dtype=np.int32)
+        # With a compiled backend its arrays are the object state, the store only mirrors them
+        kernel = getattr(self.model, "kernel", None)
+        if kernel is not None:
+            obj_x, obj_y = kernel.obj_x, kernel.obj_y
+        else:
+            obj_x, obj_y = self.model.grid.objects.x, self.model.grid.objects.y
+        obj_pos = np.column_stack((obj_x[:self.num_objects], obj_y[:self.num_objects])).astype(self.coords)
+        return ant_pos, ant_carry, obj_pos
+
+    def record(self):
+        """Append the current state of the model as the frame of model.steps."""
+        ant_pos, ant_carry, obj_pos = self._state()
+        if self._last is None:
+            ants = np.arange(len(self.ants))
+            objects = np.arange(self.num_objects)
+        else:
+            last_pos, last_carry, last_obj = self._last
+            ants = np.flatnonzero((ant_pos != last_pos).any(axis=1) | (ant_carry != last_carry))
+            objects = np.flatnonzero((obj_pos != last_obj).any(axis=1))
+        self._last = ant_pos, ant_carry, obj_pos
+
+        deltas = np.zeros(len(ants) + len(objects), dtype=self.delta_dtype)
+        deltas["kind"][len(ants):] = OBJECT
+        deltas["index"] = np.concatenate((ants, objects))
+        deltas["x"] = np.concatenate((ant_pos[ants, 0], obj_pos[objects, 0]))
+        deltas["y"] = np.concatenate((ant_pos[ants, 1], obj_pos[objects, 1]))
+        deltas["carry"][:len(ants)] = ant_carry[ants]
+        self._files["deltas"].write(deltas.tobytes())
+        self.events += len(deltas)
+
+        if self.frames % self.keyframe_interval == 0:
+            keyframe = np.zeros(1, dtype=self.keyframe_dtype)
+            keyframe["step"] = self.model.steps
+            keyframe["ant_pos"], keyframe["ant_carry"], keyframe["obj_pos"] = ant_pos, ant_carry, obj_pos
+            self._files["keyframes"].write(keyframe.tobytes())
+        self._files["index"].write(np.array([(self.model.steps, self.events)], dtype=INDEX_DTYPE).tobytes())
+        self.frames += 1
+        for f in self._files.values():
+            f.flush()
+
+    def trajectory(self):
+        """A reader of the frames recorded so far."""
+        return Trajectory(self.path)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+def _memmap(path, dtype):
+    """The complete records of a file as a read-only memmap (an empty array if there are none)."""
+    n = os.path.getsize(path) // dtype.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(n,))
+
+
+class Trajectory:
+    """Read access to a recorded trajectory directory."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        with np.load(os.path.join(path, "static.npz")) as static:
+            self.ant_ids = static["ant_ids"]
+            self.fields = {name: static[name] for name in static.files if name != "ant_ids"}
+        self.width, self.height = self.meta["width"], self.meta["height"]
+        self.keyframe_interval = self.meta["keyframe_interval"]
+        coords = np.dtype(self.meta["coords"])
+        self.index = _memmap(os.path.join(path, "index.bin"), INDEX_DTYPE)
+        self.keyframes = _memmap(os.path.join(path, "keyframes.bin"),
+                                 keyframe_dtype(self.meta["num_ants"], self.meta["num_objects"], coords))
+        self.deltas = _memmap(os.path.join(path, "deltas.bin"), delta_dtype(coords))
+        # Only frames whose keyframe has been read count (the recorder may be writing)
+        self.index = self.index[:len(self.keyframes) * self.keyframe_interval]
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def steps(self):
+        """Step of every frame."""
+        return self.index["step"]
+
+    def frame(self, step):
+        """Index of the last frame recorded at or before step."""
+        frame = int(np.searchsorted(self.index["step"], step, side="right")) - 1
+        if frame < 0:
+            raise KeyError(f"Step {step} is before the first recorded step")
+        return frame
+
+    def _events(self, first, last):
+        """Delta events of the frames first to last (inclusive)."""
+        start = int(self.index["end"][first - 1]) if first > 0 else 0
+        return self.deltas[start:int(self.index["end"][last])]
+
+    @staticmethod
+    def _apply(state, events):
+        """Apply delta events in order to state (the last event per ant or object wins)."""
+        for kind, key in ((ANT, "ant_pos"), (OBJECT, "obj_pos")):
+            changes = events[events["kind"] == kind][::-1]
+            if not len(changes):
+                continue
+            _, last = np.unique(changes["index"], return_index=True)
+            changes = changes[last]
+            state[key][changes["index"], 0] = changes["x"]
+            state[key][changes["index"], 1] = changes["y"]
+            if kind == ANT:
+                state["ant_carry"][changes["index"]] = changes["carry"]
+
+    def _state_at_frame(self, frame):
+        keyframe = self.keyframes[frame // self.keyframe_interval]
+        state = {key: np.array(keyframe[key]) for key in ("ant_pos", "ant_carry", "obj_pos")}
+        first = frame - frame % self.keyframe_interval + 1
+        if first <= frame:
+            self._apply(state, self._events(first, frame))
+        state["step"] = int(self.index["step"][frame])
+        return state
+
+    def state(self, step):
+        """ant_pos, ant_carry and obj_pos after step, from its keyframe and the deltas since."""
+        return self._state_at_frame(self.frame(step))
+
+    def states(self, start=None, stop=None):
+        """Iterate over the states of the frames with start <= step < stop, applying the deltas
+        one frame at a time. The yielded arrays are reused; copy them to keep them."""
+        steps = self.index["step"]
+        first = 0 if start is None else max(int(np.searchsorted(steps, start, side="right")) - 1, 0)
+        last = len(self) if stop is None else int(np.searchsorted(steps, stop))
+        if first >= last:
+            return
+        state = self._state_at_frame(first)
+        if start is None or state["step"] >= start:
+            yield state
+        for frame in range(first + 1, last):
+            self._apply(state, self._events(frame, frame))
+            state["step"] = int(self.index["step"][frame])
+            yield state
+
+    def slice(self, start=None, stop=None, every=1):
+        """States of every `every`-th frame with start <= step < stop, stacked into arrays
+        (step, ant_pos, ant_carry, obj_pos) with a leading frame axis."""
+        frames = [{key: np.copy(value) for key, value in state.items()}
+                  for i, state in enumerate(self.states(start, stop)) if i % every == 0]
+        return {key: np.array([frame[key] for frame in frames]) for key in ("step", "ant_pos", "ant_carry", "obj_pos")}
@@ -0,0 +1,178 @@
+"""Accuracy against cost of sampled neighbourhoods in the two ClusteringModels.
+
+For each model (u01a2, u02) a model is run for --warmup steps to get a partly clustered
+layout. Then the two neighbourhood quantities of the ants are computed at the same
+random cells for every radius r and sample count: exactly from all cells within r, and
+from sampled cells (ClusteringGrid.sample_neighborhood).
+
+- f*: the neighbourhood function of an ant carrying nothing, objects / SIGMA_SQUARED
+  with SIGMA_SQUARED = (2r + 1)^2 (times the sample weight when sampled)
+- entropy: the Shannon entropy in bits of the object types within r
+
+Every row has the mean and 95th percentile absolute error, the 95% Hoeffding bound of
+f* (common.space.sampling_error, with m the most objects in a cell) and the microseconds per
+evaluation. It also has the milliseconds per whole model step of a fresh model built with
+that radius and neighborhood_samples (all cells for the exact rows), timed over --steps
+steps. The models run in their own subprocesses, as in benchmark.py.
+
+    python sampling_benchmark.py --radii 2 5 10 20 --samples 8 16 32 64 128 --plot sampling/
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmark import DEFAULTS, MODELS, ROOT
+
+SAMPLING_MODELS = ("u01a2", "u02")
+
+
+def time_steps(model, radius, samples, steps, seed):
+    """Milliseconds per step of a 100x100 model with the given radius and neighborhood_samples."""
+    m = model.ClusteringModel(100, 100, num_agents=50, num_objects=2500, radius=radius,
+                              neighborhood_samples=samples, seed=seed)
+    m.step()  # builds the neighbourhood tables outside the timing
+    start = time.perf_counter()
+    for _ in range(steps):
+        m.step()
+    return 1000 * (time.perf_counter() - start) / steps
+
+
+def measure(name, radii, sample_counts, cells, warmup, seed, steps):
+    """Rows of errors and costs for one model, built and run in this process."""
+    spec = MODELS[name]
+    sys.path.insert(0, os.path.join(ROOT, spec["dir"]))
+    import warnings
+    warnings.simplefilter("ignore")
+    import numpy as np
+    import model
+    from common.space import sampling_error
+
+    m = spec["build"](model, dict(DEFAULTS, grid=100, ants=50, objects=2500, backend="mesa", seed=seed))
+    for _ in range(warmup):
+        m.step()
+    grid = m.grid
+    store = grid.objects
+    object_types = store.fields["object_type"].astype(np.int64)
+    num_types = int(object_types.max(initial=0)) + 1
+    most = max(map(len, store.buckets))
+    rng = np.random.default_rng(seed)
+    positions = [tuple(p) for p in np.column_stack((rng.integers(0, grid.width, cells),
+                                                    rng.integers(0, grid.height, cells))).tolist()]
+
+    def entropy(counts):
+        probabilities = counts[counts > 0] / counts.sum()
+        return float(-(probabilities * np.log2(probabilities)).sum())
+
+    def evaluate(pos, radius, samples):
+        if samples is None:
+            neighborhood, weight = grid.neighborhood(pos, radius), 1
+        else:
+            neighborhood, weight = grid.sample_neighborhood(pos, radius, samples, rng)
+        types = object_types[store.gather(neighborhood)]
+        return (weight * len(types) / (2 * radius + 1) ** 2,
+                entropy(np.bincount(types, minlength=num_types)))
+
+    rows = []
+    for radius in radii:
+        evaluate(positions[0], radius, None)  # builds the neighbourhood table outside the timing
+        window = (2 * radius + 1) ** 2 - 1
+        exact = None
+        for samples in [None] + [k for k in sample_counts if k < window]:
+            start = time.perf_counter()
+            values = np.array([evaluate(pos, radius, samples) for pos in positions])
+            seconds = time.perf_counter() - start
+            if exact is None:
+                exact = values
+            errors = np.abs(values - exact)
+            rows.append({
+                "model": name, "radius": radius, "samples": samples or window, "exact": samples is None,
+                "us_per_eval": 1e6 * seconds / len(positions),
+                "f_mean_error": errors[:, 0].mean(), "f_p95_error": np.percentile(errors[:, 0], 95),
+                "f_bound": 0.0 if samples is None else float(window * most * sampling_error(samples))
+                / (2 * radius + 1) ** 2,
+                "entropy_mean_error": errors[:, 1].mean(), "entropy_p95_error": np.percentile(errors[:, 1], 95),
+                "ms_per_step": time_steps(model, radius, samples, steps, seed),
+            })
+    return [{key: float(v) if isinstance(v, np.floating) else v for key, v in row.items()} for row in rows]
+
+
+def run_isolated(name, args):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name,
+                           "--radii", *map(str, args.radii), "--samples", *map(str, args.samples),
+                           "--cells", str(args.cells), "--warmup", str(args.warmup), "--seed", str(args.seed),
+                           "--steps", str(args.steps)],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def plot_tradeoff(rows, directory):
+    """One PNG per model: mean f* and entropy error against microseconds per evaluation."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    os.makedirs(directory, exist_ok=True)
+    for name in sorted({row["model"] for row in rows}):
+        fig = Figure(figsize=(10, 4))
+        axes = fig.subplots(1, 2)
+        for radius in sorted({row["radius"] for row in rows if row["model"] == name}):
+            points = sorted((row["us_per_eval"], row["f_mean_error"], row["entropy_mean_error"])
+                            for row in rows if row["model"] == name and row["radius"] == radius)
+            cost, f_error, entropy_error = zip(*points)
+            axes[0].plot(cost, f_error, marker="o", label=f"r = {radius}")
+            axes[1].plot(cost, entropy_error, marker="o", label=f"r = {radius}")
+        for ax, quantity in zip(axes, ("f*", "neighbour entropy (bits)")):
+            ax.set_xscale("log")
+            ax.set_xlabel("µs per evaluation")
+            ax.set_ylabel(f"mean absolute error of {quantity}")
+            ax.grid(alpha=0.5)
+            ax.legend()
+        fig.suptitle(f"{name}: sampled neighbourhoods, accuracy against cost")
+        fig.tight_layout()
+        fig.savefig(os.path.join(directory, f"{name}_sampling.png"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy and cost of sampled neighbourhoods.")
+    parser.add_argument("--models", nargs="+", default=list(SAMPLING_MODELS), choices=SAMPLING_MODELS)
+    parser.add_argument("--radii", nargs="+", type=int, default=[2, 5, 10, 20])
+    parser.add_argument("--samples", nargs="+", type=int, default=[8, 16, 32, 64, 128])
+    parser.add_argument("--cells", type=int, default=500, help="evaluated cells per radius and sample count")
+    parser.add_argument("--warmup", type=int, default=100, help="model steps before measuring")
+    parser.add_argument("--steps", type=int, default=20, help="timed model steps per radius and sample count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="JSON file for the rows")
+    parser.add_argument("--plot", default=None, help="directory for the trade-off plots")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.radii, args.samples, args.cells, args.warmup, args.seed,
+                                 args.steps)))
+        return 0
+
+    rows = []
+    for name in args.models:
+        rows.extend(run_isolated(name, args))
+    print(f"{'model':6} {'r':>3} {'samples':>7} {'µs/eval':>8} {'f* err':>8} {'f* p95':>8} {'bound':>8} "
+          f"{'H err':>8} {'H p95':>8} {'ms/step':>8}")
+    for row in rows:
+        print(f"{row['model']:6} {row['radius']:3d} {'exact' if row['exact'] else row['samples']:>7} "
+              f"{row['us_per_eval']:8.1f} {row['f_mean_error']:8.4f} {row['f_p95_error']:8.4f} "
+              f"{row['f_bound']:8.4f} {row['entropy_mean_error']:8.4f} {row['entropy_p95_error']:8.4f} "
+              f"{row['ms_per_step']:8.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=1)
+    if args.plot:
+        plot_tradeoff(rows, args.plot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())